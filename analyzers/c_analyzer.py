@@ -1,30 +1,35 @@
+from analyzers.common import branch_complexity, count_lines, line_of
+from codeguard.profiling import PROFILER, stage
+from codeguard.schema import FileResult, Issue, Severity
+from codeguard.telemetry import instrumented
+
+
 def analyze_c(file_path):
+    with PROFILER.file(file_path):
+        with stage("read"), open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            code = f.read()
+        return analyze_c_source(code, file_path)
+
+
+@instrumented("c")
+def analyze_c_source(code, file_path):
+    """Analyze in-memory source (str or bytes); file_path is only reported back."""
     issues = []
 
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        code = f.read().lower()
-
-    if "gets(" in code:
-        issues.append({
-            "issue": "Use of gets() is unsafe",
-            "severity": "CRITICAL"
-        })
-
-    if "strcpy(" in code:
-        issues.append({
-            "issue": "Use of strcpy() may cause buffer overflow",
-            "severity": "WARNING"
-        })
-
-    if "malloc(" in code and "free(" not in code:
-        issues.append({
-            "issue": "Possible memory leak detected",
-            "severity": "WARNING"
-        })
-
-    return {
-        "file": file_path,
-        "language": "c",
-        "issues": issues,
-        "complexity": code.count("if") + 1
-    }
+    if isinstance(code, bytes):
+        code = code.decode("utf-8", errors="ignore")
+    code = code.lower()
+
+    with stage("analyzer.c"):
+        if "gets(" in code:
+            issues.append(Issue("Use of gets() is unsafe", Severity.CRITICAL, line_of(code, "gets("), "security"))
+
+        if "strcpy(" in code:
+            issues.append(Issue("Use of strcpy() may cause buffer overflow", Severity.WARNING,
+                                line_of(code, "strcpy("), "security"))
+
+        if "malloc(" in code and "free(" not in code:
+            issues.append(Issue("Possible memory leak detected", Severity.WARNING,
+                                line_of(code, "malloc("), "memory"))
+
+    return FileResult(file_path, "c", issues, branch_complexity(code), count_lines(code))
@@ -0,0 +1,19 @@
+import re
+
+# Decision points counted for the C-family / Java / JavaScript complexity estimate
+_BRANCH = re.compile(r"\b(?:if|for|while|case|catch)\b|&&|\|\|")
+
+
+def line_of(code, needle):
+    """1-based line of the first occurrence of needle in code, or None."""
+    index = code.find(needle)
+    return code.count("\n", 0, index) + 1 if index >= 0 else None
+
+
+def count_lines(code):
+    return code.count("\n") + (1 if code and not code.endswith("\n") else 0)
+
+
+def branch_complexity(code):
+    """Cyclomatic complexity estimate: 1 + number of branch keywords and boolean operators."""
+    return len(_BRANCH.findall(code)) + 1
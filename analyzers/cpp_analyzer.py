@@ -1,30 +1,35 @@
+from analyzers.common import branch_complexity, count_lines, line_of
+from codeguard.profiling import PROFILER, stage
+from codeguard.schema import FileResult, Issue, Severity
+from codeguard.telemetry import instrumented
+
+
 def analyze_cpp(file_path):
+    with PROFILER.file(file_path):
+        with stage("read"), open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            code = f.read()
+        return analyze_cpp_source(code, file_path)
+
+
+@instrumented("cpp")
+def analyze_cpp_source(code, file_path):
+    """Analyze in-memory source (str or bytes); file_path is only reported back."""
     issues = []
 
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        code = f.read().lower()
-
-    if "using namespace std" in code:
-        issues.append({
-            "issue": "Avoid using namespace std",
-            "severity": "INFO"
-        })
-
-    if "new " in code and "delete" not in code:
-        issues.append({
-            "issue": "Possible memory leak (new without delete)",
-            "severity": "WARNING"
-        })
-
-    if "strcpy(" in code:
-        issues.append({
-            "issue": "Unsafe strcpy usage",
-            "severity": "CRITICAL"
-        })
-
-    return {
-        "file": file_path,
-        "language": "cpp",
-        "issues": issues,
-        "complexity": code.count("if") + 1
-    }
+    if isinstance(code, bytes):
+        code = code.decode("utf-8", errors="ignore")
+    code = code.lower()
+
+    with stage("analyzer.cpp"):
+        if "using namespace std" in code:
+            issues.append(Issue("Avoid using namespace std", Severity.INFO,
+                                line_of(code, "using namespace std"), "style"))
+
+        if "new " in code and "delete" not in code:
+            issues.append(Issue("Possible memory leak (new without delete)", Severity.WARNING,
+                                line_of(code, "new "), "memory"))
+
+        if "strcpy(" in code:
+            issues.append(Issue("Unsafe strcpy usage", Severity.CRITICAL, line_of(code, "strcpy("), "security"))
+
+    return FileResult(file_path, "cpp", issues, branch_complexity(code), count_lines(code))
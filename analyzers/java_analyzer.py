@@ -1,30 +1,35 @@
+from analyzers.common import branch_complexity, count_lines, line_of
+from codeguard.profiling import PROFILER, stage
+from codeguard.schema import FileResult, Issue, Severity
+from codeguard.telemetry import instrumented
+
+
 def analyze_java(file_path):
+    with PROFILER.file(file_path):
+        with stage("read"), open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            code = f.read()
+        return analyze_java_source(code, file_path)
+
+
+@instrumented("java")
+def analyze_java_source(code, file_path):
+    """Analyze in-memory source (str or bytes); file_path is only reported back."""
     issues = []
 
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        code = f.read()
-
-    if "System.out.println" in code:
-        issues.append({
-            "issue": "Debug print statement found",
-            "severity": "INFO"
-        })
-
-    if "public static void main" not in code:
-        issues.append({
-            "issue": "No main method detected",
-            "severity": "WARNING"
-        })
-
-    if "password" in code.lower():
-        issues.append({
-            "issue": "Hardcoded credential detected",
-            "severity": "CRITICAL"
-        })
-
-    return {
-        "file": file_path,
-        "language": "java",
-        "issues": issues,
-        "complexity": code.count("if") + 1
-    }
+    if isinstance(code, bytes):
+        code = code.decode("utf-8", errors="ignore")
+
+    with stage("analyzer.java"):
+        if "System.out.println" in code:
+            issues.append(Issue("Debug print statement found", Severity.INFO,
+                                line_of(code, "System.out.println"), "style"))
+
+        if "public static void main" not in code:
+            issues.append(Issue("No main method detected", Severity.WARNING, None, "structure"))
+
+        lowered = code.lower()
+        if "password" in lowered:
+            issues.append(Issue("Hardcoded credential detected", Severity.CRITICAL,
+                                line_of(lowered, "password"), "security"))
+
+    return FileResult(file_path, "java", issues, branch_complexity(code), count_lines(code))
@@ -1,30 +1,34 @@
+from analyzers.common import branch_complexity, count_lines, line_of
+from codeguard.profiling import PROFILER, stage
+from codeguard.schema import FileResult, Issue, Severity
+from codeguard.telemetry import instrumented
+
+
 def analyze_javascript(file_path):
+    with PROFILER.file(file_path):
+        with stage("read"), open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            code = f.read()
+        return analyze_javascript_source(code, file_path)
+
+
+@instrumented("javascript")
+def analyze_javascript_source(code, file_path):
+    """Analyze in-memory source (str or bytes); file_path is only reported back."""
     issues = []
 
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        code = f.read().lower()
-
-    if "eval(" in code:
-        issues.append({
-            "issue": "Use of eval() detected",
-            "severity": "CRITICAL"
-        })
-
-    if "var " in code:
-        issues.append({
-            "issue": "Use of var instead of let/const",
-            "severity": "WARNING"
-        })
-
-    if "console.log" in code:
-        issues.append({
-            "issue": "Debug console.log found",
-            "severity": "INFO"
-        })
-
-    return {
-        "file": file_path,
-        "language": "javascript",
-        "issues": issues,
-        "complexity": code.count("if") + 1
-    }
+    if isinstance(code, bytes):
+        code = code.decode("utf-8", errors="ignore")
+    code = code.lower()
+
+    with stage("analyzer.javascript"):
+        if "eval(" in code:
+            issues.append(Issue("Use of eval() detected", Severity.CRITICAL, line_of(code, "eval("), "security"))
+
+        if "var " in code:
+            issues.append(Issue("Use of var instead of let/const", Severity.WARNING,
+                                line_of(code, "var "), "style"))
+
+        if "console.log" in code:
+            issues.append(Issue("Debug console.log found", Severity.INFO, line_of(code, "console.log"), "style"))
+
+    return FileResult(file_path, "javascript", issues, branch_complexity(code), count_lines(code))
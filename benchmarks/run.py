@@ -0,0 +1,212 @@
+# ==========================================
+# CodeGuard benchmark harness
+# ==========================================
+# Usage:
+#   python -m benchmarks.run --files 2000 --output bench.json
+#   python -m benchmarks.run --baseline bench_main.json --threshold 0.15
+#
+# Each workload runs in a fresh interpreter so peak RSS and startup cost (the
+# same workload on a one-file tree) are measured per workload; the JSON output
+# can be compared against a baseline to fail CI on regressions.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synth import generate, parse_mix
+
+WORKLOADS = ("scan", "report", "review")
+
+# Metric -> True if bigger is better
+GATED_METRICS = {
+    "files_per_sec": True,
+    "mb_per_sec": True,
+    "peak_rss_mb": False,
+    "startup_seconds": False,
+}
+
+
+# ------------------------------------------
+# WORKER (runs inside the child interpreter)
+# ------------------------------------------
+def _stub_llm(issue_text, code_snippet=None, model="phi3", **kwargs):
+    return f"Stubbed review for {issue_text}.\n```python\n{code_snippet or ''}\n```"
+
+
+def run_worker(workload, root, workers=None):
+    # The same path as `codeguard scan/report/review DIR`: worker pool, result
+    # codec, per-file budgets and project-wide duplicate detection
+    from codeguard.__main__ import scan_tree
+    from codeguard.duplication import detect_duplicates
+    from codeguard.module1 import iter_source_files
+    from codeguard.module3 import compute_metrics
+
+    files = list(iter_source_files(root))
+    total_bytes = sum(os.path.getsize(f) for f in files)
+
+    start = time.perf_counter()
+    results = scan_tree(root, workers=workers)
+    detect_duplicates(results)
+    if workload == "report":
+        compute_metrics(results)
+    elif workload == "review":
+        import codeguard.module2 as module2
+        module2.ollama_generate = _stub_llm
+        module2.generate_ai_review(results, use_llm=True)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "files": len(files),
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "issues": sum(len(r.issues) for r in results),
+    }))
+
+
+# ------------------------------------------
+# PARENT
+# ------------------------------------------
+def _run_child(args):
+    """Run a child interpreter; returns (stdout, peak RSS in MB).
+
+    The RSS is that of the largest single process, the child or one of its
+    scan workers.
+    """
+    proc = subprocess.Popen([sys.executable] + args, stdout=subprocess.PIPE, text=True)
+    stdout = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark child failed: {' '.join(args)}")
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return stdout, usage.ru_maxrss / divisor
+
+
+def _worker_args(workload, root, workers=None):
+    args = ["-m", "benchmarks.run", "--worker", workload, root]
+    if workers is not None:
+        args += ["--workers", str(workers)]
+    return args
+
+
+def measure_startup(workload, repeat=5, workers=None):
+    """Median wall time of a fresh interpreter running workload on a one-file tree.
+
+    That is the fixed cost of a CLI run (imports, worker pool start-up,
+    the stubbed LLM client for review) which the throughput numbers spread
+    over the whole corpus.
+    """
+    timings = []
+    with tempfile.TemporaryDirectory(prefix="codeguard-startup-") as root:
+        with open(os.path.join(root, "main.py"), "w", encoding="utf-8") as f:
+            f.write("def main():\n    return eval(input())\n")
+        args = [sys.executable] + _worker_args(workload, root, workers)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(args, stdout=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def measure_workload(workload, root, repeat=3, workers=None):
+    runs = []
+    for _ in range(repeat):
+        stdout, rss = _run_child(_worker_args(workload, root, workers))
+        data = json.loads(stdout)
+        data["peak_rss_mb"] = rss
+        runs.append(data)
+    best = min(runs, key=lambda r: r["seconds"])
+    seconds = max(best["seconds"], 1e-9)
+    return {
+        "files": best["files"],
+        "bytes": best["bytes"],
+        "issues": best["issues"],
+        "seconds": round(seconds, 4),
+        "files_per_sec": round(best["files"] / seconds, 2),
+        "mb_per_sec": round(best["bytes"] / 1024 / 1024 / seconds, 3),
+        "peak_rss_mb": round(max(r["peak_rss_mb"] for r in runs), 2),
+        "startup_seconds": round(measure_startup(workload, workers=workers), 4),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return human-readable regressions beyond threshold (fraction)."""
+    regressions = []
+    for workload, current in results["workloads"].items():
+        base = baseline.get("workloads", {}).get(workload)
+        if not base:
+            continue
+        for metric, higher_is_better in GATED_METRICS.items():
+            if metric not in current or metric not in base or not base[metric]:
+                continue
+            change = (current[metric] - base[metric]) / base[metric]
+            if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+                regressions.append(f"{workload}.{metric}: {base[metric]} -> {current[metric]} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CodeGuard scan/report/review on a synthetic repo.")
+    parser.add_argument("--worker", nargs=2, metavar=("WORKLOAD", "ROOT"), help=argparse.SUPPRESS)
+    parser.add_argument("--repo", help="Benchmark an existing tree instead of generating one.")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--mix", type=parse_mix, default=None, help="e.g. py=0.7,js=0.1,java=0.1,c=0.1")
+    parser.add_argument("--large-files", type=int, default=1)
+    parser.add_argument("--large-mb", type=float, default=2.0)
+    parser.add_argument("--deep-files", type=int, default=5)
+    parser.add_argument("--tiny-files", type=int, default=200)
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Scan worker processes, as for `codeguard scan --workers` (default: CPU count).")
+    parser.add_argument("--output", help="Write results JSON here.")
+    parser.add_argument("--baseline", help="Results JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed regression as a fraction.")
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(*args.worker, workers=args.workers)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="codeguard-bench-") as tmp:
+        root = args.repo
+        corpus = None
+        if root is None:
+            root = tmp
+            corpus = generate(root, files=args.files, mix=args.mix, large_files=args.large_files,
+                              large_mb=args.large_mb, deep_files=args.deep_files, tiny_files=args.tiny_files)
+        results = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "workers": args.workers,
+            "corpus": corpus or {"repo": root},
+            "workloads": {
+                w: measure_workload(w, root, args.repeat, args.workers) for w in args.workloads.split(",") if w
+            },
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("Performance regressions beyond threshold:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
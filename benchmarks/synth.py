@@ -0,0 +1,123 @@
+# ==========================================
+# Synthetic repository generator for benchmarks
+# ==========================================
+import argparse
+import os
+import random
+
+PY_FUNCTION = '''
+def {name}(a, b):
+    total = 0
+    for i in range(a):
+        if i % 3 == 0:
+            total += i * b
+        elif i % 5 == 0:
+            total -= b
+    return total
+'''
+
+PY_CLASS = '''
+class {name}:
+    """Generated class."""
+
+    def method_{i}(self, value) -> int:
+        """Generated method."""
+        return value + {i}
+'''
+
+SNIPPETS = {
+    ".js": "function f{i}(x) {{\n  var y = x + {i};\n  if (y > 10) {{ console.log(y); }}\n  return y;\n}}\n",
+    ".java": "class C{i} {{\n  int f(int x) {{\n    if (x > {i}) {{ System.out.println(x); }}\n    return x;\n  }}\n}}\n",
+    ".c": "int f{i}(int x) {{\n  char buf[16];\n  if (x > {i}) {{ strcpy(buf, \"x\"); }}\n  return x;\n}}\n",
+    ".cpp": "int f{i}(int x) {{\n  int* p = new int[{i} + 1];\n  if (x) {{ p[0] = x; }}\n  return p[0];\n}}\n",
+}
+
+
+def python_module(rng, units):
+    parts = ["import os\n"]
+    for i in range(units):
+        if rng.random() < 0.7:
+            parts.append(PY_FUNCTION.format(name=f"func_{i}"))
+        else:
+            parts.append(PY_CLASS.format(name=f"Model{i}" if rng.random() < 0.9 else f"model{i}", i=i))
+    if rng.random() < 0.05:
+        parts.append('\nAPI_TOKEN = "not-a-real-token"\n')
+    return "".join(parts)
+
+
+def deep_python(depth):
+    """A function whose body nests `depth` if-blocks."""
+    lines = ["def deep(x):"]
+    for level in range(depth):
+        lines.append("    " * (level + 1) + f"if x > {level}:")
+    lines.append("    " * (depth + 1) + "return x")
+    lines.append("    return 0")
+    return "\n".join(lines) + "\n"
+
+
+def generate(root, files=500, mix=None, large_files=1, large_mb=2.0, deep_files=5, depth=60,
+             tiny_files=200, seed=42):
+    """Write a synthetic repo under root and return a summary of what was written."""
+    rng = random.Random(seed)
+    mix = mix or {".py": 0.7, ".js": 0.1, ".java": 0.1, ".c": 0.05, ".cpp": 0.05}
+    exts, weights = zip(*mix.items())
+    written = {"files": 0, "bytes": 0}
+
+    def write(rel_path, text):
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        written["files"] += 1
+        written["bytes"] += len(text.encode("utf-8"))
+
+    for n in range(files):
+        ext = rng.choices(exts, weights)[0]
+        package = f"pkg{n % 20}/sub{n % 7}"
+        if ext == ".py":
+            text = python_module(rng, rng.randint(3, 40))
+        else:
+            text = "".join(SNIPPETS[ext].format(i=i) for i in range(rng.randint(3, 40)))
+        write(f"{package}/mod_{n}{ext}", text)
+
+    for n in range(tiny_files):
+        write(f"tiny/t{n % 10}/tiny_{n}.py", f"X_{n} = {n}\n")
+
+    for n in range(deep_files):
+        write(f"deep/deep_{n}.py", deep_python(depth))
+
+    target = int(large_mb * 1024 * 1024)
+    for n in range(large_files):
+        parts, size, i = [], 0, 0
+        while size < target:
+            chunk = PY_FUNCTION.format(name=f"generated_{i}")
+            parts.append(chunk)
+            size += len(chunk)
+            i += 1
+        write(f"large/large_{n}.py", "".join(parts))
+
+    return written
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        ext, weight = item.split("=")
+        mix["." + ext.strip().lstrip(".")] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic repository for CodeGuard benchmarks.")
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--mix", type=parse_mix, default=None, help="e.g. py=0.7,js=0.1,java=0.1,c=0.1")
+    parser.add_argument("--large-files", type=int, default=1)
+    parser.add_argument("--large-mb", type=float, default=2.0)
+    parser.add_argument("--deep-files", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=60)
+    parser.add_argument("--tiny-files", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(generate(args.root, args.files, args.mix, args.large_files, args.large_mb,
+                   args.deep_files, args.depth, args.tiny_files, args.seed))
@@ -1,77 +1,247 @@
 import click
+import contextlib
 import json
 import os
-from codeguard.module1 import analyze_file
-from codeguard.module2 import generate_ai_review
+from codeguard.archives import is_archive, scan_archive
+from codeguard.module1 import analyze_file, iter_source_files
+from codeguard.module2 import ReviewBudget, generate_ai_review, load_feedback_policy
 from codeguard.module3 import compute_metrics
+from codeguard.daemon import daemon_request
+from codeguard.duplication import detect_duplicates
+from codeguard.engine import DEFAULT_BUDGET, analyze_guarded, scan_paths
+from codeguard.profiling import PROFILER
+from codeguard.schema import json_default
+from codeguard.telemetry import write_textfile
+
+@contextlib.contextmanager
+def profiled(table=False, json_path=None, cprofile_path=None):
+    """Enable instrumentation for the wrapped block and report afterwards."""
+    if not (table or json_path or cprofile_path):
+        yield
+        return
+    PROFILER.reset()
+    PROFILER.enabled = True
+    profiler = None
+    if cprofile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        PROFILER.enabled = False
+        if table:
+            click.echo(PROFILER.format_table(), err=True)
+        if json_path:
+            PROFILER.dump_json(json_path)
 
 @click.group()
-def main():
+@click.option("--metrics-file", type=click.Path(dir_okay=False),
+              help="Write OpenMetrics for this run here (node_exporter textfile format).")
+@click.pass_context
+def main(ctx, metrics_file):
     """CodeGuard CLI - AI-Powered Multi-Language Code Review Tool"""
-    pass
+    if metrics_file:
+        ctx.call_on_close(lambda: write_textfile(metrics_file))
 
 # -------------------------------
 # Command: scan
 # -------------------------------
 @main.command()
 @click.argument("path", type=click.Path(exists=True))
-def scan(path):
-    """Scan files for issues."""
-    results = analyze_file(path)
-    click.echo(json.dumps(results, indent=2))
+@click.option("--no-daemon", is_flag=True, help="Analyze in-process even if a daemon is running.")
+@click.option("--workers", type=int, default=None, help="Worker processes for directory scans (default: CPU count; 0 = in-process).")
+@click.option("--max-file-mb", type=float, default=DEFAULT_BUDGET["max_file_mb"], show_default=True,
+              help="Skip files larger than this.")
+@click.option("--timeout", type=float, default=DEFAULT_BUDGET["timeout_seconds"], show_default=True,
+              help="Per-file analysis time budget in seconds.")
+@click.option("--memory-mb", type=int, default=DEFAULT_BUDGET["memory_mb"], show_default=True,
+              help="Address-space limit per worker process.")
+@click.option("--shard", help="Scan only shard i of N (1-based, e.g. 2/4) and write a partial result file.")
+@click.option("--output", type=click.Path(dir_okay=False),
+              help="Partial result file for --shard (default: codeguard-shard-I-of-N.bin).")
+@click.option("--export", "export_dir", type=click.Path(file_okay=False),
+              help="Write findings/metrics tables here instead of printing JSON (directory scans).")
+@click.option("--export-format", type=click.Choice(["parquet", "ipc"]), default="parquet", show_default=True,
+              help="Parquet, or uncompressed Arrow IPC for memory-mapped reads.")
+@click.option("--baseline", "baseline_file", type=click.Path(exists=True, dir_okay=False), envvar="CODEGUARD_BASELINE",
+              help="Report only findings that are not in this baseline (see `codeguard baseline create`).")
+@click.option("--profile", is_flag=True, help="Print per-stage, per-rule and per-file timings to stderr.")
+@click.option("--profile-json", type=click.Path(dir_okay=False), help="Write the timing profile as JSON.")
+@click.option("--cprofile", type=click.Path(dir_okay=False), help="Dump cProfile stats (pstats format).")
+def scan(path, no_daemon, workers, max_file_mb, timeout, memory_mb, shard, output, export_dir, export_format,
+         baseline_file, profile, profile_json, cprofile):
+    """Scan a file, directory or .zip/.tar.* archive for issues."""
+    budget = {"max_file_mb": max_file_mb, "timeout_seconds": timeout, "memory_mb": memory_mb}
+    profiling = profile or profile_json or cprofile
+    if shard:
+        from codeguard.sharding import parse_shard, shard_paths, write_partial
+
+        if not os.path.isdir(path):
+            raise click.BadParameter("--shard needs a directory", param_hint="PATH")
+        # Partials hold every finding; exports and baselines need the merged result
+        if export_dir:
+            raise click.UsageError("--export can't be combined with --shard; pass it to `codeguard merge`")
+        if baseline_file:
+            raise click.UsageError("--baseline (or CODEGUARD_BASELINE) can't be combined with --shard; "
+                                   "partials keep every finding")
+        try:
+            index, count = parse_shard(shard)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--shard")
+        paths = shard_paths(iter_source_files(path), index, count, root=path)
+        with profiled(profile, profile_json, cprofile):
+            results = list(scan_paths(paths, workers=0 if profiling else workers, budget=budget))
+        # Duplicates are detected by `merge`, across all shards
+        output = output or f"codeguard-shard-{index}-of-{count}.bin"
+        write_partial(output, results, index, count)
+        click.echo(f"[SHARD] {index}/{count}: {len(results)} files -> {output}")
+        return
+
+    if os.path.isdir(path) or is_archive(path):
+        # The profiler only sees this process, so profiled directory scans run serially
+        with profiled(profile, profile_json, cprofile):
+            results = scan_tree(path, workers=0 if profiling else workers, budget=budget)
+            detect_duplicates(results)
+        if baseline_file:
+            results = _without_baseline(results, baseline_file)
+        if export_dir:
+            _export(results, export_dir, export_format)
+            return
+        click.echo(json.dumps(results, indent=2, default=json_default))
+        return
+
+    # The daemon analyzes with its own default budget
+    custom_budget = any(budget[key] != DEFAULT_BUDGET[key] for key in budget)
+    result = None if no_daemon or profiling or custom_budget else daemon_request(
+        "/analyze", {"path": os.path.abspath(path), "label": path})
+    if result is None:
+        with profiled(profile, profile_json, cprofile):
+            result = analyze_guarded(path, budget)
+            detect_duplicates([result])
+    if baseline_file:
+        [result] = _without_baseline([result], baseline_file)
+    click.echo(json.dumps(result, indent=2, default=json_default))
+
+def scan_tree(path, workers=None, budget=None):
+    """Results for every source file in a directory or a .zip/.tar.* archive, sorted by file."""
+    if is_archive(path):
+        results = scan_archive(path, workers=workers, budget=budget)
+    else:
+        results = scan_paths(iter_source_files(path), workers=workers, budget=budget)
+    return sorted(results, key=lambda r: r.file)
+
+
+def _without_baseline(results, baseline_file):
+    from codeguard.baseline import Baseline
+
+    results, suppressed = Baseline.load(baseline_file).filter(results)
+    click.echo(f"[BASELINE] {suppressed} known findings hidden", err=True)
+    return results
+
+
+def _export(results, directory, fmt):
+    from codeguard.columnar import write_export
+
+    paths = write_export(results, directory, fmt)
+    click.echo(f"[EXPORT] {len(results)} files, {sum(len(r.issues) for r in results)} findings -> "
+               + ", ".join(paths))
+
+# -------------------------------
+# Command: merge
+# -------------------------------
+@main.command()
+@click.argument("partials", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--output-dir", type=click.Path(file_okay=False), default=".", show_default=True,
+              help="Where to write module1_report.json and module3_metrics.json.")
+@click.option("--export", "export_dir", type=click.Path(file_okay=False),
+              help="Also write the merged findings/metrics tables here.")
+@click.option("--export-format", type=click.Choice(["parquet", "ipc"]), default="parquet", show_default=True)
+def merge(partials, output_dir, export_dir, export_format):
+    """Merge `scan --shard` partial results into full reports."""
+    from codeguard.sharding import merge_partials
+
+    try:
+        results = merge_partials(partials)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    detect_duplicates(results)
+    # Project metrics are recomputed from every file, not averaged across shards
+    metrics = compute_metrics(results)
+    os.makedirs(output_dir, exist_ok=True)
+    for name, body in (("module1_report.json", results), ("module3_metrics.json", metrics)):
+        with open(os.path.join(output_dir, name), "w", encoding="utf-8") as f:
+            json.dump(body, f, indent=2, default=json_default)
+    if export_dir:
+        _export(results, export_dir, export_format)
+    summary = metrics["summary"]
+    click.echo(f"[MERGE] {len(partials)} shards, {summary['files_analyzed']} files, "
+               f"{summary['total_issues']} issues, quality {summary['average_quality_score']} -> {output_dir}")
 
 # -------------------------------
 # Command: review
 # -------------------------------
 @main.command()
 @click.argument("path", type=click.Path(exists=True))
-def review(path):
-    """AI-powered review using Ollama."""
-    static_results = [{"file": path, "issues": analyze_file(path)}]
-    ai_results = generate_ai_review(static_results, use_llm=True)
+@click.option("--no-daemon", is_flag=True, help="Review in-process even if a daemon is running.")
+@click.option("--min-acceptance", type=float, default=0.2, show_default=True,
+              help="Use templates instead of the LLM for issue types accepted less often than this.")
+@click.option("--feedback-db", default="feedback_log.db", show_default=True,
+              help="Feedback log used to compute acceptance rates.")
+@click.option("--budget", help="Cap LLM work for this run, e.g. 60s, 2m, 100req, 50ktok (comma-separated). "
+                               "CRITICAL issues are reviewed first; the rest get template reviews.")
+@click.option("--workers", type=int, default=None, help="Worker processes for directory scans (default: CPU count; 0 = in-process).")
+@click.option("--profile", is_flag=True, help="Print stage timings and LLM latency/token counts to stderr.")
+def review(path, no_daemon, min_acceptance, feedback_db, budget, workers, profile):
+    """AI-powered review using Ollama (a file, directory or archive)."""
+    try:
+        budget = ReviewBudget.parse(budget) if budget else None
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--budget")
+    # The daemon caches complete reviews per file; budgeted runs and directories run here
+    ai_results = None if no_daemon or profile or budget or os.path.isdir(path) or is_archive(path) else daemon_request(
+        "/review", {"path": os.path.abspath(path), "label": path, "use_llm": True,
+                    "feedback_db": os.path.abspath(feedback_db), "min_acceptance": min_acceptance})
+    if ai_results is None:
+        with profiled(profile):
+            if os.path.isdir(path) or is_archive(path):
+                static_results = scan_tree(path, workers=0 if profile else workers)
+            else:
+                static_results = [analyze_file(path)]
+            detect_duplicates(static_results)
+            policy = load_feedback_policy(feedback_db, threshold=min_acceptance)
+            ai_results = generate_ai_review(static_results, use_llm=True, policy=policy, budget=budget)
     click.echo(json.dumps(ai_results, indent=2))
 
 # -------------------------------
 # Command: apply
 # -------------------------------
-import os
-import json
-import click
-from codeguard.module1 import analyze_file
-from codeguard.module2 import generate_ai_review
-
 @main.command()
 @click.argument("path", type=click.Path(exists=True))
-def apply(path):
+@click.option("--dry-run", is_flag=True, help="Print a unified diff instead of writing files.")
+@click.option("--workers", type=int, default=8, show_default=True, help="Files fixed in parallel.")
+def apply(path, dry_run, workers):
     """Auto-fix code using AI suggestions + Black."""
+    from codeguard.patcher import apply_paths, attach_snippets
 
-    # Step 1: Run static analysis
-    static_results = [{"file": path, "issues": analyze_file(path)}]
-
-    # Step 2: Get AI review suggestions
-    ai_results = generate_ai_review(static_results, use_llm=True)
-
-    applied = False
-
-    # Step 3: Apply AI fixes (only corrected code, not explanation)
-    for review in ai_results[0]["reviews"]:
-        suggestion = review.get("suggestion")
-        if suggestion:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(suggestion)   # only corrected code
-            click.echo(f"[APPLY] Applied AI fix for issue type: {review['type']}")
-            applied = True
-
-    # Step 4: Always run Black afterwards
-    if path.endswith(".py"):
-        os.system(f"black {path}")
-        click.echo("[APPLY] Auto-fix complete (AI + Black).")
-    else:
-        click.echo("[APPLY] Only Python files are supported for auto-fix right now.")
-
-    if not applied:
-        click.echo("[APPLY] No AI fix applied (suggestion was not code).")
+    def review_fn(file_path, source):
+        # Anchor each issue to its statement so the LLM rewrites just that block
+        result = analyze_file(file_path)
+        attach_snippets(source, result.issues)
+        return generate_ai_review([result], use_llm=True)[0]["reviews"]
 
+    for result in apply_paths(list(iter_source_files(path, extensions=(".py",))), review_fn, dry_run=dry_run, workers=workers):
+        if dry_run and result["diff"]:
+            click.echo(result["diff"], nl=False)
+        for kind in result["applied"]:
+            click.echo(f"[APPLY] {result['file']}: {'would apply' if dry_run else 'applied'} AI fix for issue type: {kind}")
+        for skip in result["skipped"]:
+            click.echo(f"[APPLY] {result['file']}: skipped {skip['type']} ({skip['reason']})")
+        if not result["applied"]:
+            click.echo(f"[APPLY] {result['file']}: no AI fix applied.")
 
 
 # -------------------------------
@@ -79,10 +249,36 @@ def apply(path):
 # -------------------------------
 @main.command()
 @click.argument("path", type=click.Path(exists=True))
-def report(path):
-    """Generate metrics report."""
-    static_results = [{"file": path, "issues": analyze_file(path)}]
-    metrics = compute_metrics(static_results)
+@click.option("--no-daemon", is_flag=True, help="Compute in-process even if a daemon is running.")
+@click.option("--workers", type=int, default=None, help="Worker processes for directory reports (default: CPU count; 0 = in-process).")
+@click.option("--baseline", "baseline_file", type=click.Path(exists=True, dir_okay=False), envvar="CODEGUARD_BASELINE",
+              help="Leave baselined findings (legacy debt) out of the metrics.")
+def report(path, no_daemon, workers, baseline_file):
+    """Generate metrics report for a file, a directory, an archive or a `scan --export` directory."""
+    from codeguard.columnar import export_format
+
+    baseline = None
+    if baseline_file:
+        from codeguard.baseline import Baseline
+
+        baseline = Baseline.load(baseline_file)
+    metrics = None
+    if not no_daemon and not baseline and not os.path.isdir(path) and not is_archive(path):
+        metrics = daemon_request("/report", {"path": os.path.abspath(path), "label": path})
+    if metrics is None and os.path.isdir(path) and export_format(path):
+        if baseline is not None:
+            raise click.BadParameter("exports are reported as written; pass --baseline to `scan --export`",
+                                     param_hint="--baseline")
+        metrics = compute_metrics(path)
+        metrics["files"] = metrics["files"].to_pylist()
+    if metrics is None:
+        if os.path.isdir(path) or is_archive(path):
+            results = scan_tree(path, workers=workers)
+        else:
+            results = [analyze_file(path)]
+        # Duplicates are found across every file in the report before scoring
+        detect_duplicates(results)
+        metrics = compute_metrics(results, baseline=baseline)
 
     click.echo("\n=== File Metrics ===")
     click.echo(json.dumps(metrics["files"], indent=2))
@@ -94,19 +290,112 @@ def report(path):
 # Command: diff
 # -------------------------------
 @main.command()
-@click.argument("file1", type=click.Path(exists=True))
-@click.argument("file2", type=click.Path(exists=True))
-def diff(file1, file2):
-    """Compare two files line by line."""
-    with open(file1, encoding="utf-8", errors="ignore") as f1, open(file2, encoding="utf-8", errors="ignore") as f2:
-        lines1 = f1.readlines()
-        lines2 = f2.readlines()
-
-    click.echo(f"--- {file1}")
-    click.echo(f"+++ {file2}")
-    for i, (l1, l2) in enumerate(zip(lines1, lines2), start=1):
-        if l1 != l2:
-            click.echo(f"Line {i}:\n- {l1.strip()}\n+ {l2.strip()}")
+@click.argument("file1", type=click.Path(exists=True, dir_okay=False))
+@click.argument("file2", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["unified", "json"]), default="unified",
+              help="Unified diff text or JSON hunks.")
+@click.option("--context", type=int, default=3, show_default=True, help="Context lines around changes.")
+@click.option("--analyze", is_flag=True, help="Run the analyzers on changed hunks and compare findings.")
+def diff(file1, file2, fmt, context, analyze):
+    """Compare two files (Myers diff)."""
+    from codeguard.diffing import diff_files, format_unified, analyze_hunks
+
+    old, new, hunks = diff_files(file1, file2, context=context)
+    analysis = analyze_hunks(old, new, hunks) if analyze else None
+    old.close()
+    new.close()
+
+    if fmt == "json":
+        body = {"old": file1, "new": file2, "hunks": hunks}
+        if analysis is not None:
+            body["analysis"] = analysis
+        click.echo(json.dumps(body, indent=2, default=json_default))
+        return
+
+    if hunks:
+        click.echo(format_unified(file1, file2, hunks))
+    if analysis is not None:
+        click.echo("\n=== Changed-Hunk Analysis ===")
+        click.echo(f"Issues in changed code: {analysis['old_issue_count']} -> {analysis['new_issue_count']}")
+        for sign, key in (("+", "introduced"), ("-", "resolved")):
+            for issue in analysis[key]:
+                click.echo(f"  {sign} [{issue.severity.name}] line {issue.line or '-'}: {issue.issue}")
+
+# -------------------------------
+# Command: watch
+# -------------------------------
+@main.command()
+@click.argument("path", type=click.Path(exists=True))
+@click.option("--format", "fmt", type=click.Choice(["text", "ndjson"]), default="text",
+              help="Emit human-readable lines or one JSON event per line.")
+@click.option("--debounce", type=float, default=0.3, show_default=True,
+              help="Seconds to wait for a burst of saves to settle before re-analyzing.")
+def watch(path, fmt, debounce):
+    """Watch files and re-analyze only what changed."""
+    from codeguard.watch import run_watch, ndjson_emitter, text_emitter
+
+    emitter = ndjson_emitter if fmt == "ndjson" else text_emitter
+    run_watch(path, emitter(click.echo), debounce=debounce)
+
+# -------------------------------
+# Command: index
+# -------------------------------
+@main.command()
+@click.argument("path", type=click.Path(exists=True, file_okay=False))
+@click.option("--db", type=click.Path(dir_okay=False), help="Index database (default: PATH/.codeguard/index.db).")
+@click.option("--workers", type=int, default=None, help="Worker processes for re-analysis (default: CPU count; 0 = in-process).")
+def index(path, db, workers):
+    """Update the project symbol index and run cross-file checks."""
+    from codeguard.symbols import ProjectIndex
+
+    with ProjectIndex(path, db) as project:
+        # Only files whose mtime/size changed since the last run are re-analyzed
+        changed, removed = project.stale(iter_source_files(path, extensions=(".py",)))
+        updated = project.update(scan_paths(changed, workers=workers))
+        body = {"updated": updated, "removed": len(removed), **project.report()}
+    click.echo(json.dumps(body, indent=2, default=json_default))
+
+# -------------------------------
+# Command: baseline
+# -------------------------------
+@main.group()
+def baseline():
+    """Record existing findings so that scans report only new ones."""
+
+
+@baseline.command("create")
+@click.argument("path", type=click.Path(exists=True))
+@click.option("--output", type=click.Path(dir_okay=False), default="codeguard-baseline.bin", show_default=True,
+              help="Baseline file; paths are stored relative to its directory.")
+@click.option("--workers", type=int, default=None, help="Worker processes for directory scans (default: CPU count; 0 = in-process).")
+def baseline_create(path, output, workers):
+    """Fingerprint every current finding under PATH into a baseline file."""
+    from codeguard.baseline import Baseline
+
+    if os.path.isdir(path) or is_archive(path):
+        results = scan_tree(path, workers=workers)
+    else:
+        results = [analyze_guarded(path)]
+    detect_duplicates(results)
+    accepted = Baseline.from_results(results, root=os.path.dirname(os.path.abspath(output)))
+    accepted.save(output)
+    click.echo(f"[BASELINE] {sum(len(r.issues) for r in results)} findings in {len(results)} files "
+               f"({len(accepted)} fingerprints) -> {output}")
+
+# -------------------------------
+# Command: serve
+# -------------------------------
+@main.command()
+@click.option("--host", default="127.0.0.1", show_default=True, help="Interface to bind (keep it local).")
+@click.option("--port", type=int, default=8765, show_default=True, help="Port to listen on (0 picks a free one).")
+@click.option("--workers", type=int, default=4, show_default=True, help="Size of the request worker pool.")
+@click.option("--verbose", is_flag=True, help="Log every request.")
+def serve(host, port, workers, verbose):
+    """Run a long-lived analysis daemon with a warm cache."""
+    from codeguard.daemon import serve as run_daemon
+
+    click.echo(f"[SERVE] CodeGuard daemon listening on {host}:{port} ({workers} workers)")
+    run_daemon(host=host, port=port, workers=workers, verbose=verbose)
 
 if __name__ == "__main__":
     main()
@@ -1,46 +1,36 @@
 import re
 
+from analyzers.common import branch_complexity
+from codeguard.schema import FileResult, Issue, Severity
+
+
 def analyze_python_file(file_path):
-    """Analyze a Python file and return issues."""
+    """Analyze a Python file line by line and return a FileResult."""
     issues = []
     with open(file_path, encoding="utf-8", errors="ignore") as f:
         lines = f.readlines()
 
     for i, line in enumerate(lines, start=1):
         if len(line) > 80:
-            issues.append({"severity": "WARNING", "category": "Style", "line": i})
+            issues.append(Issue("Line longer than 80 characters", Severity.WARNING, i, "Style"))
         if "TODO" in line:
-            issues.append({"severity": "INFO", "category": "Documentation", "line": i})
+            issues.append(Issue("TODO comment left in code", Severity.INFO, i, "Documentation"))
         if re.match(r"^\s*def ", line) and '"""' not in line:
-            issues.append({"severity": "ERROR", "category": "Documentation", "line": i})
+            issues.append(Issue("Function without an inline docstring", Severity.ERROR, i, "Documentation"))
 
-    complexity = sum(1 for line in lines if "if" in line or "for" in line or "while" in line)
-
-    return {
-        "file": file_path,
-        "issues": issues,
-        "complexity": complexity,
-        "lines": len(lines)
-    }
+    return FileResult(file_path, "python", issues, branch_complexity("".join(lines)), len(lines))
 
 
 def analyze_js_file(file_path):
-    """Analyze a JavaScript file and return issues."""
+    """Analyze a JavaScript file line by line and return a FileResult."""
     issues = []
     with open(file_path, encoding="utf-8", errors="ignore") as f:
         lines = f.readlines()
 
     for i, line in enumerate(lines, start=1):
         if len(line) > 100:
-            issues.append({"severity": "WARNING", "category": "Style", "line": i})
+            issues.append(Issue("Line longer than 100 characters", Severity.WARNING, i, "Style"))
         if "TODO" in line:
-            issues.append({"severity": "INFO", "category": "Documentation", "line": i})
-
-    complexity = sum(1 for line in lines if "if" in line or "for" in line or "while" in line)
+            issues.append(Issue("TODO comment left in code", Severity.INFO, i, "Documentation"))
 
-    return {
-        "file": file_path,
-        "issues": issues,
-        "complexity": complexity,
-        "lines": len(lines)
-    }
+    return FileResult(file_path, "javascript", issues, branch_complexity("".join(lines)), len(lines))
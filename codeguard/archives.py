@@ -0,0 +1,80 @@
+# ==========================================
+# Archive sources: scan .zip / .tar.* members in memory, without extracting
+# ==========================================
+import os
+import tarfile
+import zipfile
+
+from codeguard.engine import DEFAULT_BUDGET, max_file_bytes, scan_sources
+from codeguard.module1 import EXCLUDED_DIRS, SUPPORTED_EXTENSIONS
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(path):
+    return os.path.basename(str(path)).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _wanted(member, extensions):
+    parts = member.replace("\\", "/").split("/")
+    if member.startswith("/") or ".." in parts:
+        return False
+    # Same directory filter as iter_source_files
+    if any(part in EXCLUDED_DIRS or part.startswith(".") for part in parts[:-1]):
+        return False
+    return parts[-1].lower().endswith(extensions)
+
+
+def _read(fileobj, max_bytes):
+    # Read one byte past the limit so a lying header (or a zip bomb) is still caught
+    data = fileobj.read(max_bytes + 1) if max_bytes is not None else fileobj.read()
+    return None if max_bytes is not None and len(data) > max_bytes else data
+
+
+def iter_archive(source, extensions=SUPPORTED_EXTENSIONS, max_bytes=None, name=None):
+    """Yield (path, data, size) for every analyzable member of a zip or tar archive.
+
+    source is a path or a binary file object; path is the member's name
+    under name (default: the archive path), so extension dispatch and
+    reports work as for files on disk. Tar archives are read as a stream,
+    one member at a time, so compressed tarballs are decompressed once and
+    never seeked. Members larger than max_bytes are not read: data is None.
+    """
+    name = name or (source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "archive"))
+    name = os.fspath(name)
+    if zipfile.is_zipfile(source):
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _wanted(info.filename, extensions):
+                    continue
+                path = os.path.join(name, info.filename)
+                if max_bytes is not None and info.file_size > max_bytes:
+                    yield path, None, info.file_size
+                    continue
+                with archive.open(info) as f:
+                    data = _read(f, max_bytes)
+                yield path, data, info.file_size if data is None else len(data)
+        return
+
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+    kwargs = {"name": source} if isinstance(source, (str, os.PathLike)) else {"fileobj": source}
+    with tarfile.open(mode="r|*", **kwargs) as archive:
+        for info in archive:
+            if not info.isfile() or not _wanted(info.name, extensions):
+                continue
+            path = os.path.join(name, info.name)
+            if max_bytes is not None and info.size > max_bytes:
+                yield path, None, info.size
+                continue
+            data = _read(archive.extractfile(info), max_bytes)
+            yield path, data, info.size if data is None else len(data)
+
+
+def scan_archive(path, workers=None, budget=None, extensions=SUPPORTED_EXTENSIONS):
+    """Analyze an archive's members with the scan_paths worker pool and per-file budget."""
+    budget = dict(DEFAULT_BUDGET, **(budget or {}))
+    sources = iter_archive(path, extensions, max_bytes=max_file_bytes(budget))
+    return scan_sources(sources, workers=workers, budget=budget)
@@ -0,0 +1,115 @@
+# ==========================================
+# Baseline: fingerprints of accepted (legacy) findings, filtered out of scans
+# ==========================================
+import dataclasses
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+from collections import defaultdict
+
+from codeguard.schema import FileResult
+
+MAGIC = b"CGBASE1\0"
+DEFAULT_PATH = "codeguard-baseline.bin"
+DIGEST_SIZE = 8
+# Line numbers inside messages ("duplicates 'f' (a.py:12)") move with the code
+_DIGITS = re.compile(r"\d+")
+
+
+def _source_lines(path):
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read().splitlines()
+    except OSError:
+        return None
+
+
+def fingerprint_issues(result, root="."):
+    """One fingerprint per issue of result, in order.
+
+    A fingerprint hashes the file path (relative to root), the category,
+    the message with digits masked and the whitespace-normalized text of
+    the flagged source line, never the line number, so findings keep their
+    fingerprint when code above them is added or removed. Identical
+    findings in one file are told apart by their occurrence order. When the
+    source cannot be read (e.g. archive members), the issue's code snippet
+    stands in for the line.
+    """
+    rel = os.path.relpath(os.path.abspath(result.file), os.path.abspath(root)).replace(os.sep, "/")
+    lines = _source_lines(result.file) if result.issues else None
+    seen = defaultdict(int)
+    fingerprints = []
+    for issue in result.issues:
+        if lines is not None:
+            context = lines[issue.line - 1] if issue.line and 0 < issue.line <= len(lines) else ""
+        else:
+            context = issue.code or ""
+        key = "\0".join((rel, issue.category, _DIGITS.sub("#", issue.issue), " ".join(context.split())))
+        occurrence = seen[key]
+        seen[key] += 1
+        fingerprints.append(hashlib.blake2b(f"{key}\0{occurrence}".encode("utf-8"),
+                                            digest_size=DIGEST_SIZE).digest())
+    return fingerprints
+
+
+class Baseline:
+    """Set of accepted finding fingerprints.
+
+    On disk the fingerprints are a sorted run of fixed-size digests after a
+    small JSON header; in memory they are a set, so checking a finding is a
+    single hash lookup. Paths are fingerprinted relative to root, which is
+    the directory of the baseline file when it is loaded from disk.
+    """
+
+    def __init__(self, fingerprints=(), root="."):
+        self.fingerprints = frozenset(fingerprints)
+        self.root = root
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    @classmethod
+    def from_results(cls, results, root="."):
+        return cls((fp for result in results for fp in fingerprint_issues(FileResult.coerce(result), root)), root)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"{path} is not a CodeGuard baseline file")
+        offset = len(MAGIC) + 4
+        (length,) = struct.unpack(">I", data[len(MAGIC):offset])
+        body = data[offset + length:]
+        if len(body) % DIGEST_SIZE:
+            raise ValueError(f"{path} is truncated")
+        root = os.path.dirname(os.path.abspath(path))
+        return cls((body[i:i + DIGEST_SIZE] for i in range(0, len(body), DIGEST_SIZE)), root)
+
+    def save(self, path=DEFAULT_PATH):
+        header = json.dumps({"version": 1, "findings": len(self.fingerprints),
+                             "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}).encode("utf-8")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack(">I", len(header)) + header)
+            f.write(b"".join(sorted(self.fingerprints)))
+        os.replace(tmp_path, path)
+
+    def new_issues(self, result):
+        """result's issues that are not in the baseline."""
+        return [issue for issue, fp in zip(result.issues, fingerprint_issues(result, self.root))
+                if fp not in self.fingerprints]
+
+    def filter(self, results):
+        """Copies of results without baselined issues, and the number of issues removed."""
+        filtered = []
+        suppressed = 0
+        for result in results:
+            result = FileResult.coerce(result)
+            issues = self.new_issues(result) if result.issues else []
+            suppressed += len(result.issues) - len(issues)
+            filtered.append(dataclasses.replace(result, issues=issues))
+        return filtered, suppressed
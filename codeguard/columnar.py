@@ -0,0 +1,191 @@
+# ==========================================
+# Columnar export: Arrow tables for findings and per-file metrics
+# ==========================================
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from codeguard.schema import FileResult, Severity
+
+FORMATS = {"parquet": ".parquet", "ipc": ".arrow"}
+SEVERITY_NAMES = pa.array([sev.name for sev in sorted(Severity)])
+
+_label = pa.dictionary(pa.int32(), pa.string())
+FINDINGS_SCHEMA = pa.schema([
+    ("file", _label),
+    ("language", _label),
+    ("line", pa.int32()),
+    ("severity", _label),
+    ("category", _label),
+    ("issue", pa.string()),
+])
+METRICS_SCHEMA = pa.schema([
+    ("file", pa.string()),
+    ("language", _label),
+    ("status", _label),
+    ("lines", pa.int32()),
+    ("duplicated_lines", pa.int32()),
+    ("cyclomatic_complexity", pa.int32()),
+    ("quality_score", pa.int32()),
+    ("maintainability_index", pa.int32()),
+    ("issue_count", pa.int32()),
+] + [(sev.name.lower(), pa.int32()) for sev in sorted(Severity, reverse=True)] + [
+    ("average_severity", pa.float64()),
+    ("issue_density_per_100_lines", pa.float64()),
+    ("duplication_percentage", pa.float64()),
+    ("passed_quality_gate", pa.bool_()),
+])
+
+
+class _Labels:
+    """Builds one dictionary-encoded column: int32 codes plus the distinct values."""
+
+    def __init__(self):
+        self.codes = []
+        self.values = {}
+
+    def add(self, value, times=1):
+        code = self.values.get(value)
+        if code is None:
+            code = self.values[value] = len(self.values)
+        if times == 1:
+            self.codes.append(code)
+        else:
+            self.codes.extend([code] * times)
+
+    def array(self):
+        return pa.DictionaryArray.from_arrays(pa.array(self.codes, pa.int32()),
+                                              pa.array(list(self.values), pa.string()))
+
+
+def findings_table(results):
+    """One row per issue; file, language, severity and category are dictionary-encoded."""
+    files, languages, categories = _Labels(), _Labels(), _Labels()
+    lines, severities, texts = [], [], []
+    for result in results:
+        result = FileResult.coerce(result)
+        count = len(result.issues)
+        files.add(result.file, count)
+        languages.add(result.language, count)
+        for issue in result.issues:
+            lines.append(issue.line)
+            severities.append(int(issue.severity) - 1)
+            categories.add(issue.category)
+            texts.append(issue.issue)
+    severity = pa.DictionaryArray.from_arrays(pa.array(severities, pa.int32()), SEVERITY_NAMES)
+    return pa.Table.from_arrays([files.array(), languages.array(), pa.array(lines, pa.int32()), severity,
+                                 categories.array(), pa.array(texts, pa.string())], schema=FINDINGS_SCHEMA)
+
+
+def metrics_table(results):
+    """One row per file with the module3 per-file metrics, severity counts flattened."""
+    from codeguard.module3 import compute_file_metrics
+
+    columns = {field.name: [] for field in METRICS_SCHEMA}
+    languages, statuses = _Labels(), _Labels()
+    for result in results:
+        result = FileResult.coerce(result)
+        metrics, _ = compute_file_metrics(result)
+        languages.add(result.language)
+        statuses.add(metrics.pop("status"))
+        for sev, count in metrics.pop("severity_breakdown").items():
+            columns[sev.lower()].append(count)
+        for key, value in metrics.items():
+            columns[key].append(value)
+    columns["language"] = languages.array()
+    columns["status"] = statuses.array()
+    return pa.Table.from_pydict(columns, schema=METRICS_SCHEMA)
+
+
+# ------------------------------------------
+# FILES
+# ------------------------------------------
+def _paths(directory, fmt):
+    ext = FORMATS[fmt]
+    return os.path.join(directory, "findings" + ext), os.path.join(directory, "metrics" + ext)
+
+
+def _write(table, path, fmt):
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        pq.write_table(table, tmp_path, compression="zstd")
+    else:
+        # Uncompressed IPC so readers can memory-map the buffers as-is
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def write_export(results, directory, fmt="parquet"):
+    """Write findings and metrics tables to directory; returns their paths."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    results = [FileResult.coerce(r) for r in results]
+    os.makedirs(directory, exist_ok=True)
+    paths = _paths(directory, fmt)
+    for table, path in zip((findings_table(results), metrics_table(results)), paths):
+        _write(table, path, fmt)
+    return paths
+
+
+def export_format(directory):
+    """"parquet" or "ipc" if directory holds an export, else None."""
+    for fmt in FORMATS:
+        if all(os.path.isfile(p) for p in _paths(directory, fmt)):
+            return fmt
+    return None
+
+
+def _read(path, fmt):
+    if fmt == "parquet":
+        return pq.read_table(path)
+    # Memory-mapped: column buffers point into the page cache, not copies
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_export(directory):
+    """(findings, metrics) Arrow tables from an export directory."""
+    fmt = export_format(directory)
+    if fmt is None:
+        raise FileNotFoundError(f"No CodeGuard export (findings/metrics .parquet or .arrow) in {directory}")
+    return tuple(_read(path, fmt) for path in _paths(directory, fmt))
+
+
+def to_pandas(table):
+    """DataFrame view of a table: dictionary columns become Categoricals over the same codes."""
+    return table.to_pandas(split_blocks=True)
+
+
+# ------------------------------------------
+# SUMMARY
+# ------------------------------------------
+def summarize_tables(findings, metrics):
+    """module3's project summary computed column-wise, without materializing rows."""
+    skipped = pc.sum(pc.cast(pc.equal(pc.cast(metrics["status"], pa.string()), "skipped"), pa.int64())).as_py() or 0
+    count = metrics.num_rows - skipped
+    if not count:
+        return {"average_quality_score": 0, "average_maintainability_index": 0, "total_issues": 0,
+                "files_analyzed": 0, "files_skipped": skipped, "compliance_rate": 0, "duplication_percentage": 0,
+                "worst_file": None, "best_file": None, "category_distribution": {}}
+    # Skipped files have null scores, which the aggregates below ignore
+    quality = metrics["quality_score"]
+    total_lines = pc.sum(pc.if_else(pc.is_null(quality), 0, metrics["lines"])).as_py() or 0
+    categories = findings.group_by("category").aggregate([("category", "count")])
+    return {
+        "average_quality_score": round(pc.sum(quality).as_py() / count, 2),
+        "average_maintainability_index": round(pc.sum(metrics["maintainability_index"]).as_py() / count, 2),
+        "total_issues": pc.sum(metrics["issue_count"]).as_py(),
+        "files_analyzed": count,
+        "files_skipped": skipped,
+        "compliance_rate": round(pc.sum(pc.cast(metrics["passed_quality_gate"], pa.int64())).as_py() / count * 100, 2),
+        "duplication_percentage": round(
+            pc.sum(metrics["duplicated_lines"]).as_py() / total_lines * 100, 2
+        ) if total_lines else 0,
+        "worst_file": metrics["file"][pc.index(quality, pc.min(quality)).as_py()].as_py(),
+        "best_file": metrics["file"][pc.index(quality, pc.max(quality)).as_py()].as_py(),
+        "category_distribution": dict(zip(categories["category"].to_pylist(),
+                                          categories["category_count"].to_pylist())),
+    }
@@ -0,0 +1,236 @@
+# ==========================================
+# Analysis daemon: warm cache behind a local HTTP API
+# ==========================================
+import dataclasses
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from codeguard.duplication import detect_duplicates
+from codeguard.engine import scan_paths
+from codeguard.module2 import generate_ai_review, is_provisional, load_feedback_policy
+from codeguard.module3 import compute_file_metrics, summarize_metrics
+from codeguard.schema import json_default
+from codeguard.telemetry import CONTENT_TYPE, ERRORS, REGISTRY, record_cache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+STATE_FILE = os.environ.get(
+    "CODEGUARD_DAEMON_FILE",
+    os.path.join(os.path.expanduser("~"), ".codeguard", "daemon.json")
+)
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class AnalysisCache:
+    """Per-file analysis, metrics and review results keyed by (mtime, size).
+
+    An entry stays valid until the file changes on disk, so repeated hook or
+    editor requests for untouched files never re-read or re-parse them.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, path):
+        stamp = _file_stamp(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry["stamp"] == stamp:
+                self.hits += 1
+                record_cache("daemon_analysis", True)
+                return entry
+            self.misses += 1
+        record_cache("daemon_analysis", False)
+
+        # Request threads cannot use the SIGALRM deadline, so the file is
+        # analyzed in a worker process with the scan's rlimits and hard kill
+        [result] = scan_paths([path], workers=1)
+        detect_duplicates([result])
+        metrics, categories = compute_file_metrics(result)
+        entry = {"stamp": stamp, "result": result, "metrics": metrics,
+                 "categories": categories, "reviews": {}}
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def result(self, path):
+        return self._entry(path)["result"]
+
+    def metrics(self, path):
+        entry = self._entry(path)
+        return entry["metrics"], entry["categories"]
+
+    def review(self, path, use_llm=True, model="phi3", policy=None):
+        entry = self._entry(path)
+        key = (use_llm, model, policy.blocked() if policy is not None else None)
+        reviews = entry["reviews"].get(key)
+        record_cache("daemon_review", reviews is not None)
+        if reviews is None:
+            reviews = generate_ai_review([entry["result"]], use_llm=use_llm, model=model,
+                                         policy=policy)[0]["reviews"]
+            if not any(is_provisional(review) for review in reviews):
+                entry["reviews"][key] = reviews
+        return reviews
+
+    def stats(self):
+        with self._lock:
+            return {"files": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# ------------------------------------------
+# REQUEST HANDLERS
+# ------------------------------------------
+def handle_analyze(cache, payload):
+    return dataclasses.replace(cache.result(payload["path"]), file=payload.get("label", payload["path"]))
+
+
+def handle_report(cache, payload):
+    metrics, categories = cache.metrics(payload["path"])
+    metrics = dict(metrics, file=payload.get("label", payload["path"]))
+    return {"files": [metrics], "summary": summarize_metrics([metrics], dict(categories))}
+
+
+def handle_review(cache, payload):
+    policy = None
+    if payload.get("feedback_db"):
+        policy = load_feedback_policy(payload["feedback_db"], threshold=payload.get("min_acceptance", 0.2))
+    reviews = cache.review(payload["path"], use_llm=payload.get("use_llm", True),
+                           model=payload.get("model", "phi3"), policy=policy)
+    return [{"file": payload.get("label", payload["path"]), "reviews": reviews}]
+
+
+HANDLERS = {
+    "/analyze": handle_analyze,
+    "/report": handle_report,
+    "/review": handle_review,
+}
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    server_version = "CodeGuardDaemon/0.1"
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, default=json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "pid": os.getpid(), "cache": self.server.cache.stats()})
+        elif self.path == "/metrics":
+            data = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        handler = HANDLERS.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            self._send_json(200, handler(self.server.cache, payload))
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+        except Exception as e:
+            ERRORS.inc(stage="daemon")
+            self._send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class DaemonServer(ThreadingHTTPServer):
+    """HTTP server that hands each connection to a bounded worker pool."""
+
+    def __init__(self, address, workers=4, verbose=False):
+        super().__init__(address, DaemonRequestHandler)
+        self.cache = AnalysisCache()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="codeguard-worker")
+        self.verbose = verbose
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=4, verbose=False):
+    """Run the daemon until interrupted, advertising its address in STATE_FILE."""
+    # Forking this multi-threaded process could copy a lock held by another
+    # request thread into the analysis worker; start workers from a clean
+    # fork server with the engine already imported instead
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("forkserver", force=True)
+        multiprocessing.set_forkserver_preload(["codeguard.engine"])
+    server = DaemonServer((host, port), workers=workers, verbose=verbose)
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"host": host, "port": server.server_address[1], "pid": os.getpid()}, f)
+    # serve_forever() must be stopped from another thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.remove(STATE_FILE)
+        except OSError:
+            pass
+
+
+# ------------------------------------------
+# CLIENT
+# ------------------------------------------
+def daemon_request(endpoint, payload, timeout=300):
+    """POST payload to a running daemon; returns None if no daemon is reachable."""
+    if os.environ.get("CODEGUARD_NO_DAEMON"):
+        return None
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    request = urllib.request.Request(
+        f"http://{state['host']}:{state['port']}{endpoint}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        # Stale state file or daemon shutting down: fall back to local analysis
+        return None
@@ -0,0 +1,302 @@
+# ==========================================
+# Diff engine for `codeguard diff` (linear-space Myers)
+# ==========================================
+import hashlib
+from array import array
+
+from codeguard.module1 import analyze_source
+
+
+class LineIndex:
+    """Streams a file once, keeping only a line id and byte offset per line.
+
+    Lines are interned by an 8-byte BLAKE2 digest, so memory grows with the
+    number of lines (plus one digest per distinct line) rather than with the
+    file size. Line text is re-read from disk only for lines that end up in
+    a hunk.
+    """
+
+    def __init__(self, path, interner):
+        self.path = path
+        self.ids = array("l")
+        self.offsets = array("q")
+        offset = 0
+        with open(path, "rb") as f:
+            for raw in f:
+                key = hashlib.blake2b(raw.rstrip(b"\r\n"), digest_size=8).digest()
+                line_id = interner.get(key)
+                if line_id is None:
+                    line_id = interner[key] = len(interner)
+                self.ids.append(line_id)
+                self.offsets.append(offset)
+                offset += len(raw)
+        self.offsets.append(offset)
+        self._file = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def line(self, i):
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        self._file.seek(self.offsets[i])
+        raw = self._file.read(self.offsets[i + 1] - self.offsets[i])
+        return raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def text(self, start, end):
+        """Decoded text of lines [start, end)."""
+        return "\n".join(self.line(i) for i in range(start, end)) + "\n"
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# ------------------------------------------
+# MYERS O(ND) DIFF, LINEAR SPACE
+# ------------------------------------------
+def _middle_snake(a, b, alo, ahi, blo, bhi):
+    """Find a split point on an optimal edit path (forward/backward search meet)."""
+    n, m = ahi - alo, bhi - blo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    size = 2 * max_d + 2
+    v1 = [-1] * size
+    v2 = [-1] * size
+    v1[offset + 1] = 0
+    v2[offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+
+    for d in range(max_d):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < size and v2[k2_offset] != -1:
+                    if x1 >= n - v2[k2_offset]:
+                        return alo + x1, blo + y1
+
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[ahi - x2 - 1] == b[bhi - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < size and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    y1 = offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return alo + x1, blo + y1
+    return None
+
+
+def diff_matches(a, b):
+    """Return the (i, j) pairs of a longest common subsequence of a and b."""
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    # Explicit stack; ranges are pushed right-first so matches come out in order
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        tail = []
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            tail.append((ahi, bhi))
+        if tail:
+            stack.append(("tail", tail[::-1]))
+        if alo < ahi and blo < bhi:
+            split = _middle_snake(a, b, alo, ahi, blo, bhi)
+            if split is not None:
+                x, y = split
+                stack.append((x, ahi, y, bhi))
+                stack.append((alo, x, blo, y))
+        while stack and stack[-1][0] == "tail":
+            matches.extend(stack.pop()[1])
+    return matches
+
+
+def _change(i1, i2, j1, j2):
+    tag = "replace" if i1 < i2 and j1 < j2 else "delete" if i1 < i2 else "insert"
+    return [tag, i1, i2, j1, j2]
+
+
+def opcodes(a, b):
+    """difflib-style (tag, i1, i2, j1, j2) opcodes from the Myers matches."""
+    codes = []
+    i = j = 0
+    for mi, mj in diff_matches(a, b):
+        if i < mi or j < mj:
+            codes.append(_change(i, mi, j, mj))
+        last = codes[-1] if codes else None
+        if last and last[0] == "equal" and last[2] == mi and last[4] == mj:
+            last[2] += 1
+            last[4] += 1
+        else:
+            codes.append(["equal", mi, mi + 1, mj, mj + 1])
+        i, j = mi + 1, mj + 1
+    if i < len(a) or j < len(b):
+        codes.append(_change(i, len(a), j, len(b)))
+    return [tuple(code) for code in codes]
+
+
+def grouped_opcodes(codes, context=3):
+    """Group opcodes into hunks with context lines (same rules as difflib)."""
+    if not codes:
+        return []
+    codes = list(codes)
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    groups, group = [], []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > context * 2:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        groups.append(group)
+    return groups
+
+
+# ------------------------------------------
+# PUBLIC API
+# ------------------------------------------
+def diff_files(path1, path2, context=3):
+    """Diff two files; returns (old_index, new_index, hunks) where hunks are JSON-ready dicts."""
+    interner = {}
+    old, new = LineIndex(path1, interner), LineIndex(path2, interner)
+    hunks = []
+    for group in grouped_opcodes(opcodes(old.ids, new.ids), context):
+        i1, i2, j1, j2 = group[0][1], group[-1][2], group[0][3], group[-1][4]
+        lines = []
+        for tag, a1, a2, b1, b2 in group:
+            if tag == "equal":
+                lines.extend({"op": " ", "text": old.line(i)} for i in range(a1, a2))
+                continue
+            lines.extend({"op": "-", "text": old.line(i)} for i in range(a1, a2))
+            lines.extend({"op": "+", "text": new.line(j)} for j in range(b1, b2))
+        hunks.append({
+            "old_start": i1 + 1, "old_lines": i2 - i1,
+            "new_start": j1 + 1, "new_lines": j2 - j1,
+            "changes": [(tag, a1, a2, b1, b2) for tag, a1, a2, b1, b2 in group if tag != "equal"],
+            "lines": lines,
+        })
+    return old, new, hunks
+
+
+def _range(start, length):
+    # Unified diff convention: an empty range points at the line before it
+    if length == 1:
+        return str(start)
+    return f"{start if length else start - 1},{length}"
+
+
+def format_unified(path1, path2, hunks):
+    out = [f"--- {path1}", f"+++ {path2}"]
+    for h in hunks:
+        out.append(f"@@ -{_range(h['old_start'], h['old_lines'])} +{_range(h['new_start'], h['new_lines'])} @@")
+        out.extend(line["op"] + line["text"] for line in h["lines"])
+    return "\n".join(out)
+
+
+# ------------------------------------------
+# QUALITY COMPARISON ON CHANGED HUNKS
+# ------------------------------------------
+def _is_top_level(text):
+    return bool(text) and not text[0].isspace() and not text.startswith(("#", ")", "]", "}"))
+
+
+def _enclosing_blocks(index, ranges):
+    """Expand changed [start, end) ranges to whole top-level blocks and merge them."""
+    blocks = []
+    for start, end in sorted(ranges):
+        # A pure insertion after the last line has an empty range at len(index)
+        start = min(start, len(index) - 1)
+        while start > 0 and not _is_top_level(index.line(start)):
+            start -= 1
+        while start > 0 and index.line(start - 1).startswith("@"):
+            start -= 1
+        end = max(end, start + 1)
+        while end < len(index) and not _is_top_level(index.line(end)):
+            end += 1
+        if blocks and start <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], end)
+        else:
+            blocks.append([start, end])
+    return blocks
+
+
+def _analyze_ranges(index, ranges):
+    issues = []
+    for start, end in _enclosing_blocks(index, ranges):
+        for issue in analyze_source(index.text(start, end), index.path).issues:
+            if issue.line:
+                issue.line += start
+            issues.append(issue)
+    return issues
+
+
+def _issue_key(issue):
+    return (issue.issue, issue.severity, issue.category)
+
+
+def analyze_hunks(old, new, hunks):
+    """Run the analyzers on changed regions only and compare old vs new findings."""
+    old_ranges = [(a1, a2) for h in hunks for _, a1, a2, _, _ in h["changes"] if len(old)]
+    new_ranges = [(b1, b2) for h in hunks for _, _, _, b1, b2 in h["changes"] if len(new)]
+    old_issues = _analyze_ranges(old, old_ranges) if old_ranges else []
+    new_issues = _analyze_ranges(new, new_ranges) if new_ranges else []
+
+    remaining = {}
+    for issue in old_issues:
+        remaining.setdefault(_issue_key(issue), []).append(issue)
+    introduced = []
+    for issue in new_issues:
+        bucket = remaining.get(_issue_key(issue))
+        if bucket:
+            bucket.pop()
+        else:
+            introduced.append(issue)
+    resolved = [issue for bucket in remaining.values() for issue in bucket]
+    return {
+        "old_issue_count": len(old_issues),
+        "new_issue_count": len(new_issues),
+        "introduced": introduced,
+        "resolved": resolved,
+    }
@@ -2,6 +2,7 @@ import os
 from codeguard.analyzer import analyze_python_file, analyze_js_file
 
 def analyze_file(path):
+    """Line-based checks for a file or directory; returns a list of FileResults."""
     static_results = []
     if os.path.isfile(path):
         files_to_check = [path]
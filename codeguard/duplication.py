@@ -0,0 +1,223 @@
+# ==========================================
+# Duplicate-code detection (normalized AST subtrees, MinHash/LSH)
+# ==========================================
+import hashlib
+import random
+import zlib
+from array import array
+from collections import defaultdict
+
+from codeguard.schema import Issue, Severity
+
+# Functions smaller than this many AST nodes are too generic to report
+MIN_NODES = 40
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.8
+# LSH buckets bigger than this are boilerplate shapes, not copy-paste; they are
+# not expanded into candidate pairs so lookups stay near-linear
+MAX_BUCKET = 200
+CATEGORY = "duplication"
+
+# Multiply-shift hash family for the MinHash permutations; fixed seeds keep
+# signatures comparable across runs, workers and shards
+_rng = random.Random(0xC0DE)
+_MULTIPLIERS = [_rng.getrandbits(64) | 1 for _ in range(NUM_PERM)]
+_OFFSETS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+_SHINGLE_MULTIPLIERS = [_rng.getrandbits(64) | 1 for _ in range(SHINGLE_SIZE)]
+_token_ids = {}
+
+
+def _token(node_type):
+    # Identifiers and literal values are dropped: a node is just its type
+    token = _token_ids.get(node_type)
+    if token is None:
+        # crc32 rather than hash(): str hashes are salted per process, and
+        # fragments from different workers and shards must be comparable
+        token = _token_ids[node_type] = zlib.crc32(node_type.__name__.encode())
+    return token
+
+
+def python_fragments(types, depths, functions):
+    """Fingerprint every function of a module for the duplicate index.
+
+    Takes the preorder node types and depths recorded by module1's
+    ComplexityVisitor and the (node, start, end) span of each function in
+    them, so no extra tree walk is needed. Each fragment is (name, line,
+    end_line, nodes, digest, signature): digest hashes the normalized
+    subtree (types plus relative depths pin down its shape) and identifies
+    exact, renamed copies; signature is a MinHash over node-type shingles,
+    so an added statement only perturbs the shingles around it.
+    """
+    import numpy as np
+
+    spans = [(node, start, end) for node, start, end in functions if end - start >= MIN_NODES]
+    if not spans:
+        return []
+    tokens = np.array([_token(t) for t in types], dtype=np.uint64)
+    depths = np.array(depths, dtype=np.uint32)
+    multipliers = np.array(_MULTIPLIERS, dtype=np.uint64)[:, None]
+    offsets = np.array(_OFFSETS, dtype=np.uint64)[:, None]
+    shingle_multipliers = np.array(_SHINGLE_MULTIPLIERS, dtype=np.uint64)
+
+    # Shingle hashes for the whole module at once; uint64 arithmetic wraps
+    width = len(tokens) - SHINGLE_SIZE + 1
+    shingles = np.zeros(max(width, 0), dtype=np.uint64)
+    for i in range(SHINGLE_SIZE):
+        shingles ^= tokens[i:i + width] * shingle_multipliers[i]
+
+    fragments = []
+    for node, start, end in spans:
+        body = shingles[start:end - SHINGLE_SIZE + 1]
+        signature = ((multipliers * body + offsets) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+        digest = hashlib.blake2b(tokens[start:end].tobytes() + (depths[start:end] - depths[start]).tobytes(),
+                                 digest_size=16).digest()
+        fragments.append((node.name, node.lineno, node.end_lineno or node.lineno,
+                          end - start, digest, signature.tobytes()))
+    fragments.sort(key=lambda f: f[1])
+    return fragments
+
+
+def _similarity(a, b):
+    """Estimated Jaccard similarity: share of equal MinHash slots."""
+    return sum(x == y for x, y in zip(array("I", a), array("I", b))) / NUM_PERM
+
+
+class DuplicateIndex:
+    """Project-wide index of function fragments.
+
+    Exact copies share a digest; near-copies share at least one LSH band of
+    their MinHash signatures. Adding or removing a file only touches the
+    buckets its fragments live in, so whole-tree scans grow linearly with
+    the number of functions and watch mode can update one file at a time.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.fragments = {}
+        self.by_file = {}
+        # digest -> {key: None}; dicts keep insertion order, so the copy named
+        # in a finding is stable and found without scanning the group
+        self.exact = defaultdict(dict)
+        self.buckets = defaultdict(set)
+
+    @staticmethod
+    def _bands(signature):
+        width = ROWS * 4
+        return [(band, signature[band * width:(band + 1) * width]) for band in range(BANDS)]
+
+    def _neighbours(self, keys):
+        paths = set()
+        for key in keys:
+            fragment = self.fragments[key]
+            paths.update(other[0] for other in self.exact.get(fragment[4], ()))
+            for band in self._bands(fragment[5]):
+                bucket = self.buckets.get(band, ())
+                if len(bucket) <= MAX_BUCKET:
+                    paths.update(other[0] for other in bucket)
+        return paths
+
+    def _insert(self, path, fragments):
+        keys = [(path, i) for i in range(len(fragments))]
+        self.by_file[path] = keys
+        for key, fragment in zip(keys, fragments):
+            self.fragments[key] = fragment
+            self.exact[fragment[4]][key] = None
+            for band in self._bands(fragment[5]):
+                self.buckets[band].add(key)
+        return keys
+
+    def remove(self, path):
+        """Drop path's fragments; returns the files whose findings may change."""
+        keys = self.by_file.pop(path, [])
+        touched = self._neighbours(keys)
+        for key in keys:
+            fragment = self.fragments.pop(key)
+            group = self.exact[fragment[4]]
+            group.pop(key, None)
+            if not group:
+                del self.exact[fragment[4]]
+            for band in self._bands(fragment[5]):
+                self.buckets[band].discard(key)
+                if not self.buckets[band]:
+                    del self.buckets[band]
+        touched.discard(path)
+        return touched
+
+    def add(self, path, fragments):
+        """Index path's fragments (replacing earlier ones); returns affected files."""
+        touched = self.remove(path)
+        return touched | self._neighbours(self._insert(path, fragments))
+
+    def matches(self, key):
+        """Duplicates of key: (exact copy count, one exact copy, sorted near copies).
+
+        Near copies are (similarity, key) pairs from the LSH buckets, checked
+        against the similarity threshold; exact copies are excluded from them.
+        """
+        fragment = self.fragments[key]
+        group = self.exact.get(fragment[4], {})
+        first = next((other for other in group if other != key), None)
+        near = {}
+        for band in self._bands(fragment[5]):
+            bucket = self.buckets.get(band, ())
+            if len(bucket) > MAX_BUCKET:
+                continue
+            for other in bucket:
+                if other in near or other in group:
+                    continue
+                similarity = _similarity(fragment[5], self.fragments[other][5])
+                if similarity >= self.threshold:
+                    near[other] = similarity
+        return len(group) - 1, first, sorted(((s, k) for k, s in near.items()),
+                                             key=lambda item: (-item[0], item[1]))
+
+    def _where(self, path, other):
+        name, line = self.fragments[other][:2]
+        return f"'{name}' (line {line})" if other[0] == path else f"'{name}' ({other[0]}:{line})"
+
+    def findings(self, path):
+        """Duplication issues and the number of duplicated lines for one file."""
+        issues = []
+        lines = set()
+        for key in self.by_file.get(path, ()):
+            copies, first, near = self.matches(key)
+            if not copies and not near:
+                continue
+            name, line, end_line = self.fragments[key][:3]
+            others = copies + len(near) - 1
+            more = f" and {others} more" if others else ""
+            if copies:
+                issues.append(Issue(f"Function '{name}' duplicates {self._where(path, first)}{more}",
+                                    Severity.WARNING, line, CATEGORY))
+            else:
+                similarity, other = near[0]
+                issues.append(Issue(f"Function '{name}' is {similarity:.0%} similar to "
+                                    f"{self._where(path, other)}{more}",
+                                    Severity.INFO, line, CATEGORY))
+            lines.update(range(line, end_line + 1))
+        return issues, len(lines)
+
+    def apply(self, result):
+        """Replace result's duplication findings with the index's current view."""
+        issues, duplicated = self.findings(result.file)
+        result.issues = [i for i in result.issues if i.category != CATEGORY] + issues
+        result.duplicated_lines = duplicated
+        return result
+
+
+def detect_duplicates(results, index=None):
+    """Index every result's fragments and add duplication issues in place.
+
+    Safe to call again on the same results: earlier duplication findings are
+    replaced, not appended to.
+    """
+    index = index if index is not None else DuplicateIndex()
+    for result in results:
+        index.remove(result.file)
+        index._insert(result.file, result.fragments)
+    for result in results:
+        index.apply(result)
+    return index
@@ -0,0 +1,300 @@
+# ==========================================
+# Guarded analysis engine (per-file budgets, parallel scan)
+# ==========================================
+import ast
+import contextlib
+import marshal
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, size/time/depth guards still apply
+    resource = None
+
+from codeguard.module1 import ANALYZERS, analyze_file, analyze_source
+from codeguard.schema import FileResult, decode_results, encode_results
+from codeguard.telemetry import FILES_SKIPPED, REGISTRY
+
+DEFAULT_BUDGET = {
+    "max_file_mb": float(os.environ.get("CODEGUARD_MAX_FILE_MB", 5)),
+    "timeout_seconds": float(os.environ.get("CODEGUARD_FILE_TIMEOUT", 10)),
+    "memory_mb": int(os.environ.get("CODEGUARD_WORKER_MEMORY_MB", 1024)),
+    # Python recursion limit inside scan workers (CPython's default is 1000).
+    # The AST visitor uses three frames per nesting level, so this admits
+    # about 1300 levels (CPython's default stops near 330); deeper files are
+    # reported as too_deep. Pure-Python frames need no extra C stack.
+    "max_depth": 4000,
+}
+# Extra time a worker gets past timeout_seconds before the parent kills it
+HARD_TIMEOUT_GRACE = 2.0
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, reason, detail):
+        super().__init__(detail)
+        self.reason = reason
+        self.detail = detail
+
+
+def skipped_result(path, reason, detail):
+    FILES_SKIPPED.inc(reason=reason)
+    ext = os.path.splitext(path)[1].lower()
+    language = ANALYZERS[ext][0] if ext in ANALYZERS else ext.lstrip(".") or "unknown"
+    return FileResult(path, language, status="skipped", reason=reason, detail=detail)
+
+
+@contextlib.contextmanager
+def _deadline(seconds):
+    """Raise BudgetExceeded after seconds of wall time (main thread only)."""
+    if (not seconds or not hasattr(signal, "setitimer")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise BudgetExceeded("timeout", f"analysis exceeded {seconds:g}s")
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def analyze_guarded(path, budget=None):
+    """Analyze one file within the budget; returns a FileResult.
+
+    Files over max_file_mb are never read. Timeouts, recursion overflows and
+    memory exhaustion come back as "skipped" results naming the limit hit,
+    instead of stalling the scan or surfacing as a generic read error.
+    """
+    budget = dict(DEFAULT_BUDGET, **(budget or {}))
+    try:
+        size = os.path.getsize(path)
+    except OSError as e:
+        return skipped_result(path, "unreadable", str(e))
+    if size > max_file_bytes(budget):
+        return _too_large(path, size, budget)
+    return _run_guarded(path, budget, analyze_file, path)
+
+
+def analyze_source_guarded(path, data, budget=None):
+    """analyze_guarded for in-memory source (e.g. an archive member); data=None means too large to read."""
+    budget = dict(DEFAULT_BUDGET, **(budget or {}))
+    if data is None or len(data) > max_file_bytes(budget):
+        return _too_large(path, None if data is None else len(data), budget)
+    return _run_guarded(path, budget, analyze_source, data, path)
+
+
+def max_file_bytes(budget):
+    return int(budget["max_file_mb"] * 1024 * 1024)
+
+
+def _too_large(path, size, budget):
+    shown = f"{size / 1024 / 1024:.1f} MB" if size is not None else "File"
+    return skipped_result(path, "too_large", f"{shown} exceeds the {budget['max_file_mb']:g} MB limit")
+
+
+def _run_guarded(path, budget, analyze, *args):
+    try:
+        with _deadline(budget["timeout_seconds"]):
+            return analyze(*args)
+    except BudgetExceeded as e:
+        return skipped_result(path, e.reason, e.detail)
+    except RecursionError:
+        return skipped_result(path, "too_deep", "nesting exceeds the recursion limit")
+    except MemoryError as e:
+        if _raised_by_parser(e):
+            return skipped_result(path, "too_deep", "nesting exceeds the parser's stack")
+        if _memory_limited:
+            return skipped_result(path, "out_of_memory", f"exceeded the {budget['memory_mb']} MB worker limit")
+        return skipped_result(path, "out_of_memory", "ran out of memory")
+
+
+def _raised_by_parser(error):
+    """True for CPython's parser stack overflow, which is raised as a MemoryError."""
+    tb = error.__traceback__
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    code = tb.tb_frame.f_code
+    return code.co_name == "parse" and code.co_filename == ast.__file__
+
+
+# ------------------------------------------
+# WORKER POOL
+# ------------------------------------------
+# Set in worker processes once RLIMIT_AS is in place
+_memory_limited = False
+
+
+def _init_worker(budget):
+    global _memory_limited
+    if resource is not None and budget.get("memory_mb"):
+        limit = budget["memory_mb"] * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+            _memory_limited = True
+        except (ValueError, OSError):
+            pass
+    sys.setrecursionlimit(budget["max_depth"])
+
+
+def _worker_loop(conn, budget):
+    _init_worker(budget)
+    # Forked workers inherit the parent's counts; only what happens here is sent back
+    REGISTRY.drain()
+    while True:
+        item = conn.recv()
+        if item is None:
+            return
+        # Each worker runs on its main thread, so the SIGALRM deadline applies
+        result = analyze_guarded(item, budget) if isinstance(item, str) else analyze_source_guarded(*item, budget)
+        conn.send_bytes(encode_results([result]))
+        # Followed by this file's telemetry (files, bytes, latency, skips) for the parent's registry
+        conn.send_bytes(marshal.dumps(REGISTRY.drain()))
+
+
+class _Worker:
+    def __init__(self, ctx, budget):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_loop, args=(child, budget), daemon=True)
+        self.process.start()
+        child.close()
+        self.path = None
+        self.started = 0.0
+
+    def submit(self, item):
+        """Analyze a path, or a (path, data) pair of in-memory source."""
+        self.path = item if isinstance(item, str) else item[0]
+        self.started = time.monotonic()
+        self.conn.send(item)
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def scan_paths(paths, workers=None, budget=None):
+    """Analyze paths in worker processes; yields results as they complete.
+
+    The in-worker deadline cannot interrupt C code such as ast.parse, so the
+    parent also enforces a hard limit: a worker still busy after
+    timeout_seconds + HARD_TIMEOUT_GRACE is killed, its file reported as a
+    timeout and a fresh worker started. Largest files are submitted first so
+    slow files start early instead of forming the tail of the scan. With
+    workers=0 everything runs in-process (soft deadline only).
+    """
+    budget = dict(DEFAULT_BUDGET, **(budget or {}))
+    paths = list(paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    if workers <= 0:
+        for path in paths:
+            yield analyze_guarded(path, budget)
+        return
+
+    def size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    yield from _run_pool(iter(sorted(paths, key=size, reverse=True)), workers, budget)
+
+
+def scan_sources(sources, workers=None, budget=None):
+    """scan_paths for in-memory (path, data, size) sources, e.g. from archives.iter_archive.
+
+    Sources are pulled lazily as workers free up, so only about one item per
+    worker is held in memory at a time; data=None is reported as too large
+    without being sent to a worker.
+    """
+    budget = dict(DEFAULT_BUDGET, **(budget or {}))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 0:
+        for path, data, size in sources:
+            yield _too_large(path, size, budget) if data is None else analyze_source_guarded(path, data, budget)
+        return
+
+    def items():
+        for path, data, size in sources:
+            if data is None:
+                yield _too_large(path, size, budget)
+            else:
+                yield path, data
+
+    yield from _run_pool(items(), workers, budget)
+
+
+def _run_pool(pending, workers, budget):
+    """Feed items from the pending iterator to workers; FileResults in it are passed through."""
+    hard_limit = budget["timeout_seconds"] + HARD_TIMEOUT_GRACE if budget["timeout_seconds"] else None
+    ctx = multiprocessing.get_context()
+    pool = [_Worker(ctx, budget) for _ in range(workers)]
+    busy = {}
+    exhausted = False
+    try:
+        while not exhausted or busy:
+            for worker in pool:
+                while not exhausted and worker.path is None:
+                    item = next(pending, None)
+                    if item is None:
+                        exhausted = True
+                    elif isinstance(item, FileResult):
+                        yield item
+                    else:
+                        worker.submit(item)
+                        busy[worker.conn] = worker
+            if not busy:
+                continue
+
+            timeout = None
+            if hard_limit:
+                oldest = min(w.started for w in busy.values())
+                timeout = max(0.0, oldest + hard_limit - time.monotonic())
+            for conn in wait(list(busy), timeout=timeout):
+                worker = busy.pop(conn)
+                try:
+                    result = decode_results(conn.recv_bytes())[0]
+                    REGISTRY.merge(marshal.loads(conn.recv_bytes()))
+                    worker.path = None
+                    yield result
+                    continue
+                except (EOFError, OSError):
+                    result = skipped_result(worker.path, "worker_crashed", "analysis worker exited unexpectedly")
+                pool[pool.index(worker)] = _Worker(ctx, budget)
+                worker.stop(kill=True)
+                yield result
+
+            now = time.monotonic()
+            for conn, worker in list(busy.items()):
+                if hard_limit and now - worker.started > hard_limit:
+                    del busy[conn]
+                    worker.stop(kill=True)
+                    pool[pool.index(worker)] = _Worker(ctx, budget)
+                    yield skipped_result(worker.path, "timeout",
+                                         f"analysis exceeded {budget['timeout_seconds']:g}s (worker killed)")
+    finally:
+        for worker in pool:
+            worker.stop(kill=worker.path is not None)
@@ -0,0 +1,260 @@
+# ==========================================
+# Program execution pool (sandboxed, cached builds)
+# ==========================================
+import atexit
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from codeguard.telemetry import record_cache
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, runs are only bounded by the wall timeout
+    resource = None
+
+BUILD_CACHE_DIR = os.environ.get(
+    "CODEGUARD_BUILD_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "codeguard", "build")
+)
+
+DEFAULT_LIMITS = {
+    "cpu_seconds": 5,        # RLIMIT_CPU
+    "memory_mb": 256,        # RLIMIT_AS (or the runtime's own heap flag)
+    "output_bytes": 65536,   # RLIMIT_FSIZE on the captured stdout/stderr files
+    "wall_seconds": 10,      # hard timeout for sleeping/blocked programs
+}
+
+# Extension -> (language, compiler). Interpreted languages have no compiler.
+LANGUAGES = {
+    ".py": ("python", None),
+    ".js": ("javascript", None),
+    ".java": ("java", "javac"),
+    ".c": ("c", "gcc"),
+    ".cpp": ("c++", "g++"),
+}
+
+
+# preexec_fn is not safe with a thread pool, so limits are applied by a tiny
+# launcher that sets rlimits on itself and then execs the real command.
+_LAUNCHER = """
+import os, resource, sys
+cpu, fsize, mem = (int(v) for v in sys.argv[1:4])
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+if fsize:
+    resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+if mem:
+    resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+os.execvp(sys.argv[4], sys.argv[4:])
+"""
+
+
+def _sandboxed(cmd, limits, limit_memory=True):
+    """Prefix cmd with the rlimit launcher (no-op where rlimits are unavailable)."""
+    if resource is None:
+        return cmd
+    mem = limits["memory_mb"] * 1024 * 1024 if limit_memory else 0
+    return [sys.executable, "-c", _LAUNCHER,
+            str(limits["cpu_seconds"]), str(limits.get("output_bytes") or 0), str(mem)] + cmd
+
+
+def _read_capped(f, limit):
+    limit = limit or 1 << 20
+    f.seek(0)
+    data = f.read(limit + 1)
+    text = data[:limit].decode("utf-8", errors="replace")
+    if len(data) > limit:
+        text += f"\n[output truncated at {limit} bytes]"
+    return text
+
+
+def _run(cmd, limits, cwd=None, limit_memory=True):
+    """Run cmd under rlimits, capturing output into size-limited temp files."""
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        try:
+            proc = subprocess.run(
+                _sandboxed(cmd, limits, limit_memory), cwd=cwd, stdin=subprocess.DEVNULL,
+                stdout=out, stderr=err, timeout=limits["wall_seconds"], start_new_session=True
+            )
+            returncode, note = proc.returncode, None
+        except subprocess.TimeoutExpired:
+            returncode, note = None, f"Killed: exceeded {limits['wall_seconds']}s wall-clock limit."
+        except OSError as e:
+            return "", str(e), None
+        stdout = _read_capped(out, limits["output_bytes"])
+        stderr = _read_capped(err, limits["output_bytes"])
+
+    if resource is not None and returncode is not None and returncode < 0:
+        signals = {-9: "memory/CPU limit", -24: "CPU time limit", -25: "output size limit"}
+        note = f"Killed by signal {-returncode} ({signals.get(returncode, 'terminated')})."
+    if note:
+        stderr = (stderr + "\n" + note).strip()
+    return stdout, stderr, returncode
+
+
+def _source_key(path, compiler):
+    h = hashlib.sha256()
+    h.update(compiler.encode())
+    h.update(os.path.basename(path).encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _build(path, language, compiler, limits):
+    """Compile path into a cache dir keyed by source hash; reuse it if present.
+
+    Returns (run_command, compile_error, cached).
+    """
+    build_dir = os.path.join(BUILD_CACHE_DIR, _source_key(path, compiler))
+    error_file = os.path.join(build_dir, "compile_error.txt")
+    if language == "java":
+        class_name = os.path.splitext(os.path.basename(path))[0]
+        artifact = os.path.join(build_dir, class_name + ".class")
+        run_cmd = ["java", f"-Xmx{limits['memory_mb']}m", "-cp", build_dir, class_name]
+        compile_cmd = [compiler, "-d", build_dir, path]
+    else:
+        artifact = os.path.join(build_dir, "program")
+        run_cmd = [artifact]
+        compile_cmd = [compiler, path, "-o", artifact]
+
+    if os.path.exists(artifact):
+        return run_cmd, None, True
+    if os.path.exists(error_file):
+        with open(error_file, encoding="utf-8") as f:
+            return None, f.read(), True
+    if shutil.which(compiler) is None:
+        return None, f"Compiler not found: {compiler}", False
+
+    # Build into a private dir and rename, so concurrent runs of the same
+    # source never observe a half-written artifact.
+    os.makedirs(BUILD_CACHE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=BUILD_CACHE_DIR)
+    tmp_cmd = [tmp_dir if part == build_dir else part.replace(build_dir, tmp_dir) for part in compile_cmd]
+    compile_limits = dict(limits, cpu_seconds=limits["cpu_seconds"] * 6,
+                          wall_seconds=limits["wall_seconds"] * 3, output_bytes=None)
+    _, stderr, returncode = _run(tmp_cmd, compile_limits, limit_memory=False)
+    if returncode is None or returncode < 0:
+        # Timed out, killed by a limit or never started: not a verdict on the
+        # source, so nothing is cached and the next run compiles again.
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None, stderr, False
+    if returncode != 0:
+        with open(os.path.join(tmp_dir, "compile_error.txt"), "w", encoding="utf-8") as f:
+            f.write(stderr)
+    try:
+        os.rename(tmp_dir, build_dir)
+    except OSError:
+        # Another worker finished the same build first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if returncode != 0:
+        return None, stderr, False
+    return run_cmd, None, False
+
+
+def run_program(file_path, limits=None):
+    """Run a single source file under resource limits and return a result dict."""
+    limits = dict(DEFAULT_LIMITS, **(limits or {}))
+    source = os.path.abspath(file_path)
+    ext = os.path.splitext(file_path)[1].lower()
+    language, compiler = LANGUAGES.get(ext, (ext.lstrip(".") or "unknown", None))
+    result = {"file": file_path, "language": language, "stdout": "", "stderr": "",
+              "returncode": None, "duration": 0.0, "cached_build": False}
+    start = time.perf_counter()
+
+    if ext not in LANGUAGES:
+        result["stderr"] = f"Execution for {language} not supported yet."
+        return result
+
+    limit_memory = True
+    if language == "python":
+        cmd = [sys.executable, source]
+    elif language == "javascript":
+        # V8 reserves far more address space than it uses; cap its heap instead
+        cmd = ["node", f"--max-old-space-size={limits['memory_mb']}", source]
+        limit_memory = False
+    else:
+        cmd, compile_error, cached = _build(source, language, compiler, limits)
+        result["cached_build"] = cached
+        record_cache("build", cached)
+        if cmd is None:
+            result["stderr"] = compile_error
+            result["duration"] = round(time.perf_counter() - start, 3)
+            return result
+        limit_memory = language != "java"
+
+    stdout, stderr, returncode = _run(cmd, limits, cwd=os.path.dirname(source),
+                                      limit_memory=limit_memory)
+    result.update(stdout=stdout, stderr=stderr, returncode=returncode,
+                  duration=round(time.perf_counter() - start, 3))
+    return result
+
+
+def run_source(filename, data, limits=None, root=None):
+    """Run in-memory source; it is materialized in a content-addressed dir under root.
+
+    The directory is keyed by the source hash and the file keeps its name
+    (javac needs it), so identical uploads from different sessions share one
+    copy and different uploads with the same name never collide. root must
+    be private to this process (see ExecutionPool); without it a fresh
+    temporary directory is used and removed afterwards.
+    """
+    if root is None:
+        root = tempfile.mkdtemp(prefix="codeguard-runs-")
+        try:
+            return run_source(filename, data, limits, root)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    name = os.path.basename(filename)
+    run_dir = os.path.join(root, hashlib.sha256(data).hexdigest()[:32])
+    path = os.path.join(run_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(run_dir, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=run_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    result = run_program(path, limits)
+    result["file"] = filename
+    return result
+
+
+class ExecutionPool:
+    """Runs programs concurrently and yields each result as soon as it finishes.
+
+    In-memory sources are written below a run directory created with
+    mkdtemp (mode 0700), so other local users cannot pre-create or
+    symlink into it; it is removed by close() or at interpreter exit.
+    """
+
+    def __init__(self, max_workers=None, limits=None):
+        self.max_workers = max_workers or min(8, os.cpu_count() or 2)
+        self.limits = limits
+        self.run_dir = tempfile.mkdtemp(prefix="codeguard-runs-")
+        atexit.register(self.close)
+
+    def close(self):
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+    def run_many(self, file_paths):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(run_program, path, self.limits) for path in file_paths]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def run_sources(self, sources):
+        """Like run_many, for (filename, data) pairs held in memory."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(run_source, name, data, self.limits, self.run_dir)
+                       for name, data in sources]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,192 @@
+# ==========================================
+# Feedback store (SQLite, WAL mode)
+# ==========================================
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB = "feedback_log.db"
+LEGACY_JSON = "feedback_log.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    file TEXT,
+    issue TEXT NOT NULL,
+    decision TEXT NOT NULL,
+    category TEXT,
+    language TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_issue ON feedback (issue, decision);
+CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, ts REAL NOT NULL);
+"""
+
+
+class FeedbackStore:
+    """Append-only accept/reject log.
+
+    SQLite in WAL mode gives every Streamlit session its own connection with
+    file-level locking handled by SQLite, so concurrent clicks never lose
+    entries and an insert costs the same no matter how large the log is.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, file, issue, decision, category=None, language=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO feedback (ts, file, issue, decision, category, language) VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), file, issue, decision, category, language)
+            )
+
+    def entries(self):
+        rows = self._connect().execute(
+            "SELECT file, issue, decision, category, language FROM feedback ORDER BY id"
+        )
+        return [
+            {"file": f, "issue": i, "decision": d, "category": c, "language": l}
+            for f, i, d, c, l in rows
+        ]
+
+    def acceptance_stats(self, group_by="issue"):
+        """Acceptance rate per issue type (or category / language).
+
+        group_by may also be a tuple of those columns, e.g. ("issue",
+        "language"), in which case the keys are tuples. Rows without a value
+        for a grouped column are left out rather than counted under None.
+        """
+        columns = (group_by,) if isinstance(group_by, str) else tuple(group_by)
+        for column in columns:
+            if column not in ("issue", "category", "language"):
+                raise ValueError(f"Cannot group feedback by {column!r}")
+        keys = ", ".join(columns)
+        present = " AND ".join(f"{column} IS NOT NULL" for column in columns)
+        rows = self._connect().execute(
+            f"SELECT {keys}, SUM(decision = 'accepted'), COUNT(*) FROM feedback WHERE {present} GROUP BY {keys}"
+        )
+        stats = {}
+        for row in rows:
+            key = row[0] if len(columns) == 1 else tuple(row[:len(columns)])
+            accepted, total = row[len(columns):]
+            stats[key] = {"accepted": accepted, "total": total, "acceptance_rate": round(accepted / total, 4)}
+        return stats
+
+    def migrate_json(self, json_path=LEGACY_JSON):
+        """Import a legacy feedback_log.json once; returns the number of entries imported."""
+        if not os.path.exists(json_path):
+            return 0
+        name = os.path.abspath(json_path)
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        now = time.time()
+        rows = [
+            (now, e.get("file"), e.get("issue"), e.get("decision"), e.get("category"), e.get("language"))
+            for e in data if isinstance(e, dict) and e.get("issue") and e.get("decision")
+        ]
+        conn = self._connect()
+        with conn:
+            # Take the write lock before checking, so two processes can't both import
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+                return 0
+            conn.executemany(
+                "INSERT INTO feedback (ts, file, issue, decision, category, language) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("INSERT INTO migrations (name, ts) VALUES (?, ?)", (name, now))
+        return len(rows)
+
+
+class FeedbackPolicy:
+    """Decides whether an issue group is worth an LLM call, from past feedback.
+
+    Acceptance statistics are computed once when the policy is built, so the
+    per-group check inside generate_ai_review is a few dict lookups. A group
+    is sent to the model unless its issue type or category has at least
+    min_samples decisions and an acceptance rate below threshold, overall or
+    (for the issue type) within the group's language. Language alone never
+    blocks a group: one noisy rule must not silence every other rule for
+    that language.
+    """
+
+    def __init__(self, by_issue=None, by_category=None, by_issue_language=None, threshold=0.2, min_samples=5):
+        self.by_issue = by_issue or {}
+        self.by_category = by_category or {}
+        self.by_issue_language = by_issue_language or {}
+        self.threshold = threshold
+        self.min_samples = min_samples
+
+    @classmethod
+    def from_store(cls, store, threshold=0.2, min_samples=5):
+        return cls(
+            by_issue=store.acceptance_stats("issue"),
+            by_category=store.acceptance_stats("category"),
+            by_issue_language=store.acceptance_stats(("issue", "language")),
+            threshold=threshold,
+            min_samples=min_samples,
+        )
+
+    def _rejected(self, entry):
+        return entry is not None and entry["total"] >= self.min_samples and entry["acceptance_rate"] < self.threshold
+
+    def blocked(self):
+        """Keys currently routed to templates; changes whenever a decision flips."""
+        return tuple(
+            tuple(sorted(key for key, entry in stats.items() if self._rejected(entry)))
+            for stats in (self.by_issue, self.by_category, self.by_issue_language)
+        )
+
+    def skip_reason(self, issue_type, category=None, language=None):
+        """Return why the LLM should be skipped for this group, or None to call it."""
+        for label, stats, key in (("issue type", self.by_issue, issue_type),
+                                  ("category", self.by_category, category),
+                                  (f"issue type in {language}", self.by_issue_language, (issue_type, language))):
+            entry = stats.get(key)
+            if self._rejected(entry):
+                shown = key[0] if isinstance(key, tuple) else key
+                return (f"{label} '{shown}' accepted {entry['accepted']}/{entry['total']} times "
+                        f"(below {self.threshold:.0%})")
+        return None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=DEFAULT_DB):
+    """Shared store per path; migrates legacy JSON logs on first use.
+
+    A legacy foo.json path opens foo.db beside it. The JSON file with the
+    database's own stem and a sibling feedback_log.json are both imported.
+    """
+    stem, ext = os.path.splitext(path)
+    if ext == ".json":
+        path = stem + ".db"
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = FeedbackStore(path)
+            for json_path in dict.fromkeys([os.path.splitext(key)[0] + ".json", os.path.join(os.path.dirname(key), LEGACY_JSON)]):
+                store.migrate_json(json_path)
+            _stores[key] = store
+    return store
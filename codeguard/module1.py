@@ -1,17 +1,48 @@
 import os
 import ast
 
+from analyzers.c_analyzer import analyze_c_source
+from analyzers.common import count_lines
+from analyzers.cpp_analyzer import analyze_cpp_source
+from analyzers.java_analyzer import analyze_java_source
+from analyzers.javascript_analyzer import analyze_javascript_source
+from codeguard.duplication import python_fragments
+from codeguard.profiling import PROFILER, stage
+from codeguard.schema import FileResult, Issue, Severity
+from codeguard.symbols import python_symbols
+from codeguard.telemetry import ERRORS, instrumented
+
 class ComplexityVisitor(ast.NodeVisitor):
     def __init__(self):
         self.complexity = 1
         self.max_depth = 0
         self.current_depth = 0
+        # Preorder node types/depths and function spans, for codeguard.duplication
+        self.types = []
+        self.depths = []
+        self.functions = []
+        # Imports and referenced names, for the project index (codeguard.symbols)
+        self.imports = []
+        self.names = set()
 
     def generic_visit(self, node):
+        start = len(self.types)
+        node_type = type(node)
+        self.types.append(node_type)
+        if node_type is ast.Name:
+            if type(node.ctx) is ast.Load:
+                self.names.add(node.id)
+        elif node_type is ast.Attribute:
+            self.names.add(node.attr)
+        elif node_type is ast.Import or node_type is ast.ImportFrom:
+            self.imports.append(node)
+        self.depths.append(self.current_depth)
         self.current_depth += 1
         self.max_depth = max(self.max_depth, self.current_depth)
         super().generic_visit(node)
         self.current_depth -= 1
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            self.functions.append((node, start, len(self.types)))
 
     def visit_If(self, node):
         self.complexity += 1
@@ -34,92 +65,163 @@ class ComplexityVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
 
+def _decode(source):
+    if isinstance(source, bytes):
+        return source.decode("utf-8")
+    return source
+
+
+# ------------------------------------------
+# RULES (one issue or None per node)
+# ------------------------------------------
+def _function_length(node):
+    length = node.body[-1].lineno - node.lineno + 1
+    if length > 50:
+        return Issue(f"Function '{node.name}' too long ({length} lines)",
+                     Severity.WARNING, node.lineno, "maintainability")
+
+
+def _function_docstring(node):
+    if not ast.get_docstring(node):
+        return Issue(f"Missing docstring in function '{node.name}'",
+                     Severity.INFO, node.lineno, "documentation")
+
+
+def _function_return_hint(node):
+    if not node.returns:
+        return Issue(f"Missing return type hint in function '{node.name}'",
+                     Severity.INFO, node.lineno, "type hint")
+
+
+def _class_pascal_case(node):
+    if not node.name[0].isupper():
+        return Issue(f"Class '{node.name}' should use PascalCase", Severity.WARNING, node.lineno, "naming")
+
+
+FUNCTION_RULES = [_function_length, _function_docstring, _function_return_hint]
+CLASS_RULES = [_class_pascal_case]
+
+
 def analyze_python(file_path):
+    with PROFILER.file(file_path):
+        try:
+            with stage("read"), open(file_path, "r", encoding="utf-8") as f:
+                code = f.read()
+        except (OSError, UnicodeDecodeError):
+            ERRORS.inc(stage="read")
+            return FileResult(file_path, "python", [Issue("Unable to read file", Severity.CRITICAL, None, "io")])
+
+        return analyze_python_source(code, file_path)
+
+
+@instrumented("python")
+def analyze_python_source(code, file_path="<memory>"):
+    """Analyze Python source text (str or UTF-8 bytes) without touching disk."""
     issues = []
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            code = f.read()
-    except Exception:
-        return [{"issue": "Unable to read file", "severity": "CRITICAL", "category": "io"}]
+        code = _decode(code)
+    except UnicodeDecodeError:
+        ERRORS.inc(stage="read")
+        return FileResult(file_path, "python", [Issue("Unable to read file", Severity.CRITICAL, None, "io")])
+    lines = count_lines(code)
 
     try:
-        tree = ast.parse(code)
+        with stage("parse"):
+            tree = ast.parse(code)
     except SyntaxError as e:
-        return [{"issue": f"Syntax error: {e}", "severity": "CRITICAL", "category": "syntax"}]
+        ERRORS.inc(stage="parse")
+        return FileResult(file_path, "python", [Issue(f"Syntax error: {e}", Severity.CRITICAL, None, "syntax")],
+                          lines=lines)
 
-    visitor = ComplexityVisitor()
-    visitor.visit(tree)
-    complexity = visitor.complexity
+    with stage("complexity"):
+        visitor = ComplexityVisitor()
+        visitor.visit(tree)
+        complexity = visitor.complexity
 
     if complexity > 10:
-        issues.append({
-            "issue": "High cyclomatic complexity",
-            "severity": "WARNING",
-            "line": None,
-            "category": "complexity"
-        })
-
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            length = node.body[-1].lineno - node.lineno + 1
-            if length > 50:
-                issues.append({
-                    "issue": f"Function '{node.name}' too long ({length} lines)",
-                    "severity": "WARNING",
-                    "line": node.lineno,
-                    "category": "maintainability"
-                })
-
-            if not ast.get_docstring(node):
-                issues.append({
-                    "issue": f"Missing docstring in function '{node.name}'",
-                    "severity": "INFO",
-                    "line": node.lineno,
-                    "category": "documentation"
-                })
-
-            if not node.returns:
-                issues.append({
-                    "issue": f"Missing return type hint in function '{node.name}'",
-                    "severity": "INFO",
-                    "line": node.lineno,
-                    "category": "type hint"
-                })
-
-        if isinstance(node, ast.ClassDef):
-            if not node.name[0].isupper():
-                issues.append({
-                    "issue": f"Class '{node.name}' should use PascalCase",
-                    "severity": "WARNING",
-                    "line": node.lineno,
-                    "category": "naming"
-                })
-
-    lowered = code.lower()
-    if any(k in lowered for k in ["password", "api_key", "apikey", "secret", "token"]):
-        issues.append({
-            "issue": "Possible hardcoded secret detected",
-            "severity": "CRITICAL",
-            "line": None,
-            "category": "security"
-        })
-
-    if "eval(" in lowered or "exec(" in lowered:
-        issues.append({
-            "issue": "Unsafe use of eval/exec detected",
-            "severity": "CRITICAL",
-            "line": None,
-            "category": "security"
-        })
-
-    return issues
+        issues.append(Issue("High cyclomatic complexity", Severity.WARNING, None, "complexity"))
+
+    function_rules = PROFILER.timed_rules(FUNCTION_RULES)
+    class_rules = PROFILER.timed_rules(CLASS_RULES)
+    with stage("rules"):
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                rules = function_rules
+            elif isinstance(node, ast.ClassDef):
+                rules = class_rules
+            else:
+                continue
+            for rule in rules:
+                issue = rule(node)
+                if issue:
+                    issues.append(issue)
+
+    with stage("secret_scan"):
+        lowered = code.lower()
+        if any(k in lowered for k in ["password", "api_key", "apikey", "secret", "token"]):
+            issues.append(Issue("Possible hardcoded secret detected", Severity.CRITICAL, None, "security"))
+
+        if "eval(" in lowered or "exec(" in lowered:
+            issues.append(Issue("Unsafe use of eval/exec detected", Severity.CRITICAL, None, "security"))
+
+    with stage("fingerprint"):
+        fragments = python_fragments(visitor.types, visitor.depths, visitor.functions)
+        symbols = python_symbols(tree, visitor.imports, visitor.names)
+
+    return FileResult(file_path, "python", issues, complexity, lines, fragments=fragments, symbols=symbols)
+
+
+# extension -> (language, analyze_<lang>_source)
+ANALYZERS = {
+    ".py": ("python", analyze_python_source),
+    ".js": ("javascript", analyze_javascript_source),
+    ".java": ("java", analyze_java_source),
+    ".c": ("c", analyze_c_source),
+    ".cpp": ("cpp", analyze_cpp_source),
+}
+SUPPORTED_EXTENSIONS = tuple(ANALYZERS)
+EXCLUDED_DIRS = {".git", "__pycache__", "venv", ".venv", "build", "dist", "codeguard.egg-info"}
+
+
+def iter_source_files(path, extensions=SUPPORTED_EXTENSIONS):
+    """Yield analyzable source files under path (or path itself if it is a file)."""
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in EXCLUDED_DIRS and not d.startswith("."))
+        for fname in sorted(files):
+            if fname.endswith(extensions):
+                yield os.path.join(root, fname)
+
+
+def _unsupported(file_path, ext):
+    return FileResult(file_path, ext.lstrip(".") or "unknown",
+                      [Issue("Language not supported yet", Severity.INFO, None, "general")])
 
 
 def analyze_file(file_path):
-    """Wrapper that dispatches to the right analyzer based on file extension."""
+    """Dispatch to the analyzer for the file's extension; returns a FileResult."""
     ext = os.path.splitext(file_path)[1].lower()
     if ext == ".py":
         return analyze_python(file_path)
-    else:
-        return [{"issue": "Language not supported yet", "severity": "INFO", "category": "general"}]
+    if ext not in ANALYZERS:
+        return _unsupported(file_path, ext)
+    language, analyze = ANALYZERS[ext]
+    with PROFILER.file(file_path):
+        try:
+            with stage("read"), open(file_path, "rb") as f:
+                code = f.read()
+        except OSError:
+            ERRORS.inc(stage="read")
+            return FileResult(file_path, language, [Issue("Unable to read file", Severity.CRITICAL, None, "io")])
+        return analyze(code, file_path)
+
+
+def analyze_source(source, file_path):
+    """Like analyze_file, but for in-memory source; file_path only selects the analyzer."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in ANALYZERS:
+        return _unsupported(file_path, ext)
+    return ANALYZERS[ext][1](source, file_path)
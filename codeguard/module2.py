@@ -1,7 +1,21 @@
+import builtins
+import hashlib
+import heapq
+import io
 import json
+import keyword
 import os
+import re
+import threading
+import time
+import tokenize
 import requests
 from collections import defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from codeguard.profiling import PROFILER
+from codeguard.schema import FileResult, Severity
+from codeguard.telemetry import ERRORS, LLM_QUEUE_DEPTH, LLM_SECONDS, LLM_TOKENS, record_cache
+from codeguard.feedback import DEFAULT_DB, FeedbackPolicy, get_store
 
 # ------------------------------------------
 # KNOWLEDGE BASE (Fallback Templates)
@@ -43,7 +57,17 @@ def classify_issue(category: str):
 # ------------------------------------------
 # OLLAMA INTEGRATION
 # ------------------------------------------
-def ollama_generate(issue_text, code_snippet=None, model="phi3"):
+# ollama_generate answers a failed request with a message starting with this
+LLM_ERROR_PREFIX = "[Ollama error:"
+
+def ollama_generate(issue_text, code_snippet=None, model="phi3", deadline=None, usage=None):
+    """Ask the model about one issue.
+
+    deadline is a time.monotonic() value: if the answer is still streaming
+    then, the request is abandoned and None is returned. usage, if given, is
+    filled with the server's token counts.
+    """
+    usage = usage if usage is not None else {}
     prompt = f"""
 You are a code reviewer. First, explain the issue clearly for humans.
 Issue: {issue_text}
@@ -53,46 +77,356 @@ Then output the corrected code, wrapped in triple backticks:
 {code_snippet or ''}
 
 """
+    start = time.perf_counter()
+    LLM_QUEUE_DEPTH.inc()
     try:
+        timeout = max(deadline - time.monotonic(), 0.001) if deadline is not None else None
         response = requests.post(
             "http://localhost:11434/api/generate",
             json={"model": model, "prompt": prompt},
-            stream=True
+            stream=True,
+            timeout=timeout
         )
         response.raise_for_status()
 
         output = ""
-        for line in response.iter_lines():
+        for line in response.iter_lines(chunk_size=None):
+            if deadline is not None and time.monotonic() > deadline:
+                response.close()
+                return None
             if line:
                 try:
                     data = json.loads(line.decode("utf-8"))
                     output += data.get("response", "")
+                    if data.get("done"):
+                        usage.update(data)
                 except json.JSONDecodeError:
                     continue
 
         return output.strip()
+    except requests.Timeout:
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        ERRORS.inc(stage="llm")
+        return f"{LLM_ERROR_PREFIX} request timed out]"
     except Exception as e:
-        return f"[Ollama error: {e}]"
+        ERRORS.inc(stage="llm")
+        return f"{LLM_ERROR_PREFIX} {e}]"
+    finally:
+        elapsed = time.perf_counter() - start
+        LLM_QUEUE_DEPTH.dec()
+        LLM_SECONDS.observe(elapsed, model=model)
+        LLM_TOKENS.inc(usage.get("prompt_eval_count", 0), model=model, kind="prompt")
+        LLM_TOKENS.inc(usage.get("eval_count", 0), model=model, kind="completion")
+        PROFILER.record_llm(elapsed, usage.get("prompt_eval_count", 0), usage.get("eval_count", 0))
+
+# ------------------------------------------
+# SCHEDULING (most valuable work first, bounded per run)
+# ------------------------------------------
+_BUDGET_UNITS = {
+    "s": ("seconds", 1), "sec": ("seconds", 1), "m": ("seconds", 60), "min": ("seconds", 60),
+    "h": ("seconds", 3600), "req": ("requests", 1), "requests": ("requests", 1),
+    "tok": ("tokens", 1), "tokens": ("tokens", 1), "ktok": ("tokens", 1000),
+}
+
+
+class ReviewBudget:
+    """Upper bound on the LLM work of one review run.
+
+    Any combination of wall-clock seconds, request count and tokens
+    (prompt + completion) can be set; the clock starts when the budget is
+    created, so scanning counts against a deadline too.
+    """
+
+    def __init__(self, seconds=None, requests=None, tokens=None):
+        self.seconds = seconds
+        self.requests = requests
+        self.tokens = tokens
+        self.started = time.monotonic()
+        self.requests_used = 0
+        self.tokens_used = 0
+
+    @classmethod
+    def parse(cls, text):
+        """Budget from e.g. "60s", "2m", "100req", "50ktok" or several of them comma-separated."""
+        limits = {}
+        for part in filter(None, (p.strip() for p in text.lower().split(","))):
+            match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([a-z]*)", part)
+            unit = _BUDGET_UNITS.get(match.group(2) or "s") if match else None
+            if unit is None:
+                raise ValueError(f"invalid budget {part!r} (expected e.g. 60s, 2m, 100req, 50ktok)")
+            name, scale = unit
+            limits[name] = float(match.group(1)) * scale
+        if not limits:
+            raise ValueError("empty budget")
+        for name in ("requests", "tokens"):
+            if name in limits:
+                limits[name] = int(limits[name])
+        return cls(**limits)
+
+    @property
+    def deadline(self):
+        return self.started + self.seconds if self.seconds is not None else None
+
+    def exhausted(self):
+        """Name of the first limit that has been reached, or None."""
+        if self.seconds is not None and time.monotonic() >= self.deadline:
+            return "time"
+        if self.requests is not None and self.requests_used >= self.requests:
+            return "requests"
+        if self.tokens is not None and self.tokens_used >= self.tokens:
+            return "tokens"
+        return None
+
+    def charge(self, tokens):
+        self.requests_used += 1
+        self.tokens_used += tokens
+
+
+def review_priority(entry):
+    """Sort key for review groups: CRITICAL first, then the most occurrences."""
+    return -Severity.parse(entry["severity"]), -entry["occurrences"]
+
+
+def _request_priority(entries):
+    """A coalesced request is worth its most severe group and all occurrences together."""
+    return (min(review_priority(e)[0] for e in entries), -sum(e["occurrences"] for e in entries))
+
+
+# ------------------------------------------
+# REQUEST COALESCING (identical prompts share one call)
+# ------------------------------------------
+# Fallback lexers (non-Python snippets, or Python that tokenize rejects):
+# comments and string literals are single tokens, so their contents are
+# never renamed, and a newline token keeps the next line's indentation
+_C_TOKEN_RE = re.compile(r"""//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|[A-Za-z_]\w*|\n[ \t]*|\S""", re.S)
+_PY_TOKEN_RE = re.compile(r"""#[^\n]*|[rbfu]*"(?:\\.|[^"\\\n])*"|[rbfu]*'(?:\\.|[^'\\\n])*'|[A-Za-z_]\w*|\n[ \t]*|\S""", re.I)
+_KEYWORDS = frozenset(keyword.kwlist) | frozenset(keyword.softkwlist) | frozenset((
+    "abstract", "auto", "boolean", "break", "byte", "case", "catch", "char", "class", "const", "continue",
+    "default", "delete", "do", "double", "else", "enum", "export", "extends", "extern", "final", "finally",
+    "float", "for", "function", "goto", "if", "implements", "import", "instanceof", "int", "interface",
+    "let", "long", "native", "new", "null", "package", "private", "protected", "public", "register",
+    "return", "short", "signed", "sizeof", "static", "struct", "super", "switch", "synchronized", "this",
+    "throw", "throws", "true", "false", "try", "typedef", "typeof", "union", "unsigned", "var", "void",
+    "volatile", "while", "std", "include", "define", "self", "cls",
+)) | frozenset(dir(builtins))
+
+_PY_KINDS = {tokenize.NAME: "name", tokenize.NEWLINE: "newline", tokenize.INDENT: "indent",
+             tokenize.DEDENT: "dedent"}
+# Stand-ins for Python's block structure in normalized text
+_STRUCTURE = {"newline": "\n", "indent": "\x01", "dedent": "\x02"}
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _python_tokens(code):
+    lines = io.StringIO(code).readlines()
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    tokens = []
+    for tok in tokenize.generate_tokens(iter(lines).__next__):
+        if tok.type in (tokenize.NL, tokenize.ENDMARKER):
+            continue
+        start = offsets[tok.start[0] - 1] + tok.start[1]
+        end = offsets[tok.end[0] - 1] + tok.end[1]
+        tokens.append((_PY_KINDS.get(tok.type, "other"), tok.string, start, end))
+    return tokens
+
+
+def _snippet_tokens(code, language=None):
+    """(kind, text, start, end) for each token of code.
+
+    kind is "name" for identifiers (keywords included), "newline",
+    "indent"/"dedent" (Python only) or "other". Python is read with
+    tokenize, so its block structure is kept and names inside comments,
+    strings and f-string literals are not names; other languages, and
+    Python that does not tokenize, go through a regex lexer.
+    """
+    if language == "python":
+        try:
+            return _python_tokens(code)
+        except (tokenize.TokenError, SyntaxError):
+            pass
+    pattern = _PY_TOKEN_RE if language == "python" else _C_TOKEN_RE
+    tokens = []
+    for m in pattern.finditer(code):
+        text = m.group(0)
+        if text[0] == "\n":
+            kind = "newline"
+        elif text[0].isalpha() or text[0] == "_":
+            kind = "name" if text.isidentifier() else "other"
+        else:
+            kind = "other"
+        tokens.append((kind, text, m.start(), m.end()))
+    return tokens
+
+
+def normalize_snippet(code, language=None):
+    """(normalized text, identifiers in order of first appearance) for a snippet.
+
+    Spacing within a line is dropped, but line breaks and indentation are
+    kept, and every identifier that is not a keyword, a builtin or an
+    attribute name becomes a positional placeholder, so `x = eval(a)` and
+    `y  =  eval(b)` normalize to the same text while `eval(a)` and
+    `exec(a)`, or a statement inside and outside an `if` block, do not.
+    Comments and string literals are kept verbatim.
+    """
+    names = {}
+    parts = []
+    previous = None
+    for kind, text, _, _ in _snippet_tokens(code or "", language):
+        if kind == "name" and text not in _KEYWORDS and previous != ".":
+            part = "\0%d" % names.setdefault(text, len(names))
+        elif kind == "newline":
+            # Regex-lexed newlines carry the next line's indentation; blank lines collapse
+            part = "\n" + text.lstrip("\n").expandtabs(4) if text.startswith("\n") else "\n"
+            if parts and parts[-1].startswith("\n"):
+                parts.pop()
+        else:
+            part = _STRUCTURE.get(kind, text)
+        previous = text
+        parts.append(part)
+    while parts and parts[-1].startswith("\n"):
+        parts.pop()
+    return " ".join(parts), list(names)
+
+
+def prompt_fingerprint(issue_text, code, model, language=None):
+    """Key under which identical review requests are coalesced."""
+    normalized, _ = normalize_snippet(code, language)
+    return hashlib.blake2b(f"{model}\0{issue_text}\0{language}\0{normalized}".encode("utf-8"),
+                           digest_size=16).hexdigest()
+
+
+def _rename(code, source_names, target_names, language=None):
+    """Map source_names[i] to target_names[i] in code's identifiers.
+
+    Only name tokens are rewritten, never attribute names or text inside
+    comments and string literals. All names are substituted at once, and a
+    name the answer introduced itself that equals one of target_names gets
+    a fresh suffix first, so no renamed identifier captures another.
+    """
+    pairs = dict(zip(source_names, target_names))
+    mapping = {a: b for a, b in pairs.items() if a != b}
+    if not code or not mapping:
+        return code
+    tokens = _snippet_tokens(code, language)
+    names = {}
+    previous = None
+    for kind, text, _, _ in tokens:
+        if kind == "name" and previous != ".":
+            names[text] = None
+        previous = text
+    targets = set(mapping.values())
+    taken = set(names) | set(pairs) | set(target_names)
+    for name in names:
+        if name not in pairs and name in targets:
+            i = 1
+            while f"{name}_{i}" in taken:
+                i += 1
+            mapping[name] = f"{name}_{i}"
+            taken.add(mapping[name])
+    parts = []
+    last = 0
+    previous = None
+    for kind, text, start, end in tokens:
+        if kind == "name" and previous != "." and text in mapping:
+            parts.append(code[last:start])
+            parts.append(mapping[text])
+            last = end
+        previous = text
+    parts.append(code[last:])
+    return "".join(parts)
+
+
+def _shared_generate(fingerprint, issue_text, code_snippet, model, deadline, usage):
+    """ollama_generate, sharing one in-flight request per fingerprint across threads.
+
+    Returns (response, owned): owned is False when another caller's request
+    answered this one. A shared request that was abandoned at its owner's
+    deadline is retried while this caller still has time.
+    """
+    while True:
+        with _inflight_lock:
+            future = _inflight.get(fingerprint)
+            owned = future is None
+            if owned:
+                future = _inflight[fingerprint] = Future()
+        if owned:
+            try:
+                future.set_result(ollama_generate(issue_text, code_snippet, model=model,
+                                                  deadline=deadline, usage=usage))
+            except BaseException as exc:
+                future.set_exception(exc)
+                raise
+            finally:
+                with _inflight_lock:
+                    _inflight.pop(fingerprint, None)
+            return future.result(), True
+        try:
+            response = future.result(timeout=max(deadline - time.monotonic(), 0)
+                                     if deadline is not None else None)
+        except FutureTimeout:
+            return None, False
+        if response is not None or (deadline is not None and time.monotonic() >= deadline):
+            return response, False
+
+
+def _split_response(llm_response):
+    """(explanation, code fix or None) from a model answer."""
+    if "```" in llm_response:
+        parts = llm_response.split("```")
+        return parts[0].strip(), parts[1].replace("python", "").replace("```", "").strip()
+    return llm_response, None
+
 
 # ------------------------------------------
 # MAIN REVIEW FUNCTION
 # ------------------------------------------
-def generate_ai_review(static_results, use_llm=True, model="phi3"):
+def template_review(issue_text, template):
+    """Review fields built from the ISSUE_KB templates (no LLM call)."""
+    if template:
+        return {
+            "review": f"Issue: {issue_text}\nWhy: {template['review']}",
+            "suggestion": f"Fix: {template['suggestion']}",
+            "auto_fix_recommended": template["auto_fix"]
+        }
+    return {
+        "review": f"Issue: {issue_text}\nWhy: Generic issue detected.",
+        "suggestion": "Fix: Review code and apply best practices.",
+        "auto_fix_recommended": False
+    }
+
+
+def generate_ai_review(static_results, use_llm=True, model="phi3", policy=None, budget=None):
+    """Review grouped static issues.
+
+    LLM calls are scheduled across all files by review_priority, so CRITICAL
+    groups are answered before INFO ones whatever file they are in, and each
+    file's reviews are listed in that order. When a FeedbackPolicy is given,
+    groups that developers keep rejecting get the template review instead of
+    an LLM call; with a ReviewBudget, so does every group left once the
+    budget runs out. Both carry a "skipped_llm" reason.
+
+    Groups whose prompts match after normalize_snippet (same issue, same
+    code up to whitespace and names) are sent once; the answer's code is
+    renamed back to each group's identifiers.
+    """
     final_output = []
+    requests_by_prompt = {}
+    # The language is part of the fingerprint, so every member of a request shares it
+    request_languages = {}
 
     for file_result in static_results:
-        if not isinstance(file_result, dict):
+        if not isinstance(file_result, (FileResult, dict)):
             continue
-
-        issues = file_result.get("issues", [])
+        file_result = FileResult.coerce(file_result)
         grouped_issues = defaultdict(list)
 
-        for issue in issues:
-            if isinstance(issue, dict):
-                issue_type = issue.get("category", "unknown")
-                grouped_issues[issue_type].append(issue)
-            else:
-                grouped_issues[str(issue)].append({"severity": "INFO", "category": str(issue)})
+        for issue in file_result.issues:
+            grouped_issues[issue.category].append(issue)
 
         reviews = []
         for issue_text, occurrences in grouped_issues.items():
@@ -101,76 +435,116 @@ def generate_ai_review(static_results, use_llm=True, model="phi3"):
 
             review_entry = {
                 "type": issue_text,
-                "severity": occurrences[0].get("severity", "INFO"),
+                "severity": occurrences[0].severity.name,
                 "occurrences": len(occurrences),
-                "line": occurrences[0].get("line"),
-                "code": occurrences[0].get("code"),
+                "line": occurrences[0].line,
+                "code": occurrences[0].code,
                 "category": issue_text
             }
 
-            if use_llm:
-                code_snippet = occurrences[0].get("code", None)
-                llm_response = ollama_generate(issue_text, code_snippet, model=model)
-
-                # Split explanation and code
-                explanation, code_fix = llm_response, None
-                if "```" in llm_response:
-                    parts = llm_response.split("```")
-                    explanation = parts[0].strip()
-                    code_fix = parts[1].replace("python", "").replace("```", "").strip()
-
-                review_entry.update({
-                    "review": f"Issue: {issue_text}\n{explanation}",   # human explanation
-                    "suggestion": code_fix or (template["suggestion"] if template else "Review code and apply best practices."),  # code only
-                    "auto_fix_recommended": template["auto_fix"] if template else False
-                })
+            skip_reason = None
+            if use_llm and policy is not None:
+                skip_reason = policy.skip_reason(issue_text, key, file_result.language)
+
+            if use_llm and skip_reason is None:
+                fingerprint = prompt_fingerprint(issue_text, review_entry["code"], model, file_result.language)
+                request_languages[fingerprint] = file_result.language
+                requests_by_prompt.setdefault(fingerprint, []).append((review_entry, template))
             else:
-                if template:
-                    review_entry.update({
-                        "review": f"Issue: {issue_text}\nWhy: {template['review']}",
-                        "suggestion": f"Fix: {template['suggestion']}",
-                        "auto_fix_recommended": template["auto_fix"]
-                    })
-                else:
-                    review_entry.update({
-                        "review": f"Issue: {issue_text}\nWhy: Generic issue detected.",
-                        "suggestion": "Fix: Review code and apply best practices.",
-                        "auto_fix_recommended": False
-                    })
+                review_entry.update(template_review(issue_text, template))
+                if skip_reason:
+                    review_entry["skipped_llm"] = skip_reason
 
             reviews.append(review_entry)
 
+        reviews.sort(key=review_priority)
         final_output.append({
-            "file": file_result.get("file", "unknown"),
+            "file": file_result.file,
             "reviews": reviews
         })
 
+    pending = [(_request_priority([e for e, _ in members]), i, fingerprint, members)
+               for i, (fingerprint, members) in enumerate(requests_by_prompt.items())]
+    heapq.heapify(pending)
+    while pending:
+        _, _, fingerprint, members = heapq.heappop(pending)
+        first = members[0][0]
+        issue_text = first["type"]
+        exhausted = budget.exhausted() if budget is not None else None
+        llm_response = None
+        if exhausted is None:
+            usage = {}
+            llm_response, owned = _shared_generate(fingerprint, issue_text, first["code"], model,
+                                                   budget.deadline if budget is not None else None, usage)
+            for i in range(len(members)):
+                record_cache("llm_request", i > 0 or not owned)
+            if budget is not None:
+                if owned:
+                    tokens = usage.get("prompt_eval_count", 0) + usage.get("eval_count", 0)
+                    # Rough 4-characters-per-token estimate when the server reports no counts
+                    budget.charge(tokens or (len(issue_text) + len(first["code"] or "")
+                                             + len(llm_response or "")) // 4)
+                if llm_response is None:
+                    exhausted = "time"
+
+        if llm_response is None:
+            for review_entry, template in members:
+                review_entry.update(template_review(issue_text, template))
+                review_entry["skipped_llm"] = f"review budget exhausted ({exhausted})"
+            continue
+
+        # Split explanation and code
+        explanation, code_fix = _split_response(llm_response)
+        language = request_languages[fingerprint]
+        _, first_names = normalize_snippet(first["code"], language)
+        for review_entry, template in members:
+            if review_entry is not first:
+                code_fix_for = _rename(code_fix, first_names, normalize_snippet(review_entry["code"], language)[1],
+                                       language)
+            else:
+                code_fix_for = code_fix
+            review_entry.update({
+                "review": f"Issue: {issue_text}\n{explanation}",   # human explanation
+                "suggestion": code_fix_for or (template["suggestion"] if template else "Review code and apply best practices."),  # code only
+                "auto_fix_recommended": template["auto_fix"] if template else False
+            })
+            if llm_response.startswith(LLM_ERROR_PREFIX):
+                review_entry["llm_error"] = llm_response
+
     return final_output
 
+def is_provisional(review):
+    """True for a review that stands in for an LLM answer this run could not get.
+
+    That is a template review the budget cut short, or one whose request
+    failed ("llm_error"). Callers that cache reviews (the Streamlit app, the
+    daemon) should ask again next time instead of keeping these.
+    """
+    return "llm_error" in review or review.get("skipped_llm", "").startswith("review budget exhausted")
+
 # ------------------------------------------
 # FEEDBACK LOOP (ACCEPT/REJECT)
 # ------------------------------------------
-def log_feedback(file, issue_type, decision, log_file="feedback_log.json"):
-    feedback_entry = {
-        "file": file,
-        "issue": issue_type,
-        "decision": decision
-    }
-
+def log_feedback(file, issue_type, decision, log_file=DEFAULT_DB, category=None, language=None):
+    # Legacy callers may still pass foo.json; get_store migrates its entries
+    # into foo.db beside it.
     try:
-        if os.path.exists(log_file):
-            with open(log_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        else:
-            data = []
-
-        data.append(feedback_entry)
-
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        get_store(log_file).append(file, issue_type, decision, category=category, language=language)
     except Exception as e:
         print(f"[ERROR] Could not log feedback: {e}")
 
+
+def feedback_stats(log_file=DEFAULT_DB, group_by="issue"):
+    """Acceptance rate per issue type (or category / language) from the feedback log."""
+    return get_store(log_file).acceptance_stats(group_by)
+
+
+def load_feedback_policy(log_file=DEFAULT_DB, threshold=0.2, min_samples=5):
+    """FeedbackPolicy from the feedback log, or None if no feedback was recorded yet."""
+    if not os.path.exists(log_file):
+        return None
+    return FeedbackPolicy.from_store(get_store(log_file), threshold=threshold, min_samples=min_samples)
+
 # ------------------------------------------
 # DEMO RUNNER
 # ------------------------------------------
@@ -1,85 +1,155 @@
 # ==========================================
 # Module 3: Metrics & Validation
 # ==========================================
+import os
 
-def compute_metrics(static_results):
-    severity_weights = {"CRITICAL": 20, "ERROR": 15, "WARNING": 10, "INFO": 5}
-    files = []
-    total_score = 0
-    total_issues = 0
+from codeguard.profiling import stage
+from codeguard.schema import FileResult, Severity
+from codeguard.telemetry import record_summary
+
+SEVERITY_WEIGHTS = {Severity.CRITICAL: 20, Severity.ERROR: 15, Severity.WARNING: 10, Severity.INFO: 5}
+# Report order for severity_breakdown
+SEVERITY_ORDER = sorted(Severity, reverse=True)
+
+
+def compute_file_metrics(file):
+    """Compute metrics for a single file result.
+
+    Returns the per-file metrics dict and the file's category counts, so
+    callers that keep results in memory (e.g. watch mode) can update one
+    file without recomputing the whole project. Skipped files (too large,
+    timed out, ...) were never analyzed, so they get no score and no gate
+    result; summarize_metrics counts them separately.
+    """
+    file = FileResult.coerce(file)
+    if file.status == "skipped":
+        return {
+            "file": file.file,
+            "status": file.status,
+            "quality_score": None,
+            "cyclomatic_complexity": file.complexity,
+            "issue_count": 0,
+            "severity_breakdown": {sev.name: 0 for sev in SEVERITY_ORDER},
+            "maintainability_index": None,
+            "average_severity": None,
+            "issue_density_per_100_lines": None,
+            "lines": file.lines,
+            "duplicated_lines": 0,
+            "duplication_percentage": 0,
+            "passed_quality_gate": None
+        }, {}
+
+    issues = file.issues
+    # Indexed by Severity value; severities are compared as ints, not strings
+    counts = [0] * (max(Severity) + 1)
     category_counts = {}
 
-    for file in static_results:
-        score = 100
-        severity_counts = {"CRITICAL": 0, "ERROR": 0, "WARNING": 0, "INFO": 0}
-
-        # Deduct points based on severity
-        for issue in file.get("issues", []):
-            if isinstance(issue, dict):
-                sev = issue.get("severity", "INFO").upper()
-                cat = issue.get("category", "General")
-            else:
-                # If analyzer returned a string, treat as INFO
-                sev = "INFO"
-                cat = "General"
-
-            if sev not in severity_counts:
-                severity_counts[sev] = 0
-            severity_counts[sev] += 1
-            score -= severity_weights.get(sev, 5)
-
-            # Track category distribution
-            category_counts[cat] = category_counts.get(cat, 0) + 1
-
-        score = max(score, 0)
-        total_score += score
-        total_issues += len(file.get("issues", []))
-
-        # Weighted maintainability index
-        maintainability_index = max(
-            0,
-            100 - (file.get("complexity", 0) * 5)
-                - (severity_counts["CRITICAL"] * 10
-                   + severity_counts["ERROR"] * 7
-                   + severity_counts["WARNING"] * 5
-                   + severity_counts["INFO"] * 2)
-        )
-
-        # Extra metrics
-        avg_severity = (
-            (severity_counts["CRITICAL"] * 4 +
-             severity_counts["ERROR"] * 3 +
-             severity_counts["WARNING"] * 2 +
-             severity_counts["INFO"] * 1) / max(len(file.get("issues", [])), 1)
-        )
-        issue_density = round(len(file.get("issues", [])) / max(file.get("lines", 100), 100) * 100, 2)
-
-        files.append({
-            "file": file.get("file", "unknown"),
-            "quality_score": score,
-            "cyclomatic_complexity": file.get("complexity", 0),
-            "issue_count": len(file.get("issues", [])),
-            "severity_breakdown": severity_counts,
-            "maintainability_index": maintainability_index,
-            "average_severity": round(avg_severity, 2),
-            "issue_density_per_100_lines": issue_density,
-            "passed_quality_gate": score >= 70 and maintainability_index >= 50
-        })
-
-    # Project-level summary
-    project_summary = {
-        "average_quality_score": round(total_score / len(static_results), 2) if static_results else 0,
+    for issue in issues:
+        counts[issue.severity] += 1
+        category_counts[issue.category] = category_counts.get(issue.category, 0) + 1
+
+    # Deduct points based on severity
+    score = 100 - sum(SEVERITY_WEIGHTS[sev] * counts[sev] for sev in Severity)
+    score = max(score, 0)
+
+    # Weighted maintainability index
+    maintainability_index = max(
+        0,
+        100 - (file.complexity * 5)
+            - (counts[Severity.CRITICAL] * 10
+               + counts[Severity.ERROR] * 7
+               + counts[Severity.WARNING] * 5
+               + counts[Severity.INFO] * 2)
+    )
+
+    # Extra metrics
+    avg_severity = sum(int(sev) * counts[sev] for sev in Severity) / max(len(issues), 1)
+    issue_density = round(len(issues) / max(file.lines, 100) * 100, 2)
+    duplication = round(file.duplicated_lines / file.lines * 100, 2) if file.lines else 0
+
+    metrics = {
+        "file": file.file,
+        "status": file.status,
+        "quality_score": score,
+        "cyclomatic_complexity": file.complexity,
+        "issue_count": len(issues),
+        "severity_breakdown": {sev.name: counts[sev] for sev in SEVERITY_ORDER},
+        "maintainability_index": maintainability_index,
+        "average_severity": round(avg_severity, 2),
+        "issue_density_per_100_lines": issue_density,
+        "lines": file.lines,
+        "duplicated_lines": file.duplicated_lines,
+        "duplication_percentage": duplication,
+        "passed_quality_gate": score >= 70 and maintainability_index >= 50
+    }
+    return metrics, category_counts
+
+
+def summarize_metrics(files, category_counts):
+    """Build the project-level summary from per-file metrics.
+
+    Scores, the compliance rate and best/worst file cover analyzed files
+    only; skipped files are reported as "files_skipped".
+    """
+    skipped = sum(1 for f in files if f.get("status") == "skipped")
+    if skipped:
+        files = [f for f in files if f.get("status") != "skipped"]
+    total_lines = sum(f.get("lines", 0) for f in files)
+    return {
+        "average_quality_score": round(sum(f["quality_score"] for f in files) / len(files), 2) if files else 0,
         "average_maintainability_index": round(sum(f["maintainability_index"] for f in files) / len(files), 2) if files else 0,
-        "total_issues": total_issues,
-        "files_analyzed": len(static_results),
+        "total_issues": sum(f["issue_count"] for f in files),
+        "files_analyzed": len(files),
+        "files_skipped": skipped,
         "compliance_rate": round(
             sum(1 for f in files if f["passed_quality_gate"]) / len(files) * 100, 2
         ) if files else 0,
+        "duplication_percentage": round(
+            sum(f.get("duplicated_lines", 0) for f in files) / total_lines * 100, 2
+        ) if total_lines else 0,
         "worst_file": min(files, key=lambda f: f["quality_score"])["file"] if files else None,
         "best_file": max(files, key=lambda f: f["quality_score"])["file"] if files else None,
         "category_distribution": category_counts
     }
 
+
+def compute_metrics(static_results, baseline=None):
+    """Per-file metrics and the project summary.
+
+    static_results may also be the directory of a columnar export (see
+    codeguard.columnar); the summary is then computed column-wise and
+    "files" is the per-file metrics Arrow table. With a Baseline (see
+    codeguard.baseline), baselined findings are left out of every metric
+    and counted in the summary's "baseline_issues".
+    """
+    if isinstance(static_results, (str, os.PathLike)):
+        from codeguard.columnar import read_export, summarize_tables
+
+        with stage("metrics"):
+            findings, files = read_export(static_results)
+            project_summary = summarize_tables(findings, files)
+            record_summary(project_summary)
+        return {"files": files, "summary": project_summary}
+
+    files = []
+    category_counts = {}
+    suppressed = None
+
+    with stage("metrics"):
+        if baseline is not None:
+            static_results, suppressed = baseline.filter(static_results)
+        for file in static_results:
+            metrics, categories = compute_file_metrics(file)
+            files.append(metrics)
+            for cat, count in categories.items():
+                category_counts[cat] = category_counts.get(cat, 0) + count
+
+        # Project-level summary
+        project_summary = summarize_metrics(files, category_counts)
+        if suppressed is not None:
+            project_summary["baseline_issues"] = suppressed
+        record_summary(project_summary)
+
     return {
         "files": files,
         "summary": project_summary
@@ -0,0 +1,177 @@
+# ==========================================
+# Patch-level auto-fix (used by `codeguard apply`)
+# ==========================================
+import ast
+import difflib
+import os
+import tempfile
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+
+# Black's default; replacements are formatted to fit it at their indentation
+LINE_LENGTH = 88
+
+
+def _anchor_node(tree, line):
+    """Outermost statement starting at line (decorators included), or None."""
+    best = None
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.stmt):
+            continue
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        if node.lineno == line or start == line:
+            if best is None or (node.end_lineno - start) > (best[1] - best[0]):
+                best = (start, node.end_lineno, node.col_offset)
+    return best
+
+
+def attach_snippets(source, issues):
+    """Give line-anchored issues the source of their statement as "code".
+
+    The LLM then rewrites exactly that statement, which is what the patch
+    replaces.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return issues
+    lines = source.splitlines(keepends=True)
+    for issue in issues:
+        if issue.line and not issue.code:
+            anchor = _anchor_node(tree, issue.line)
+            if anchor:
+                issue.code = textwrap.dedent("".join(lines[anchor[0] - 1:anchor[1]]))
+    return issues
+
+
+def _as_code(suggestion):
+    """Return the suggestion if it is standalone Python, else None."""
+    if not suggestion or suggestion.startswith("Fix:"):
+        return None
+    code = textwrap.dedent(suggestion).strip("\n")
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return None
+    return code
+
+
+def build_patches(source, reviews):
+    """Turn reviews into validated, non-overlapping line-range patches.
+
+    Returns (patches, skipped) where each patch is (start, end, new_text, type)
+    with 1-based inclusive line numbers in the original source.
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+    candidates, skipped = [], []
+
+    for review in reviews:
+        kind = review.get("type", "unknown")
+        code = _as_code(review.get("suggestion"))
+        if code is None:
+            skipped.append({"type": kind, "reason": "suggestion is not valid Python code"})
+            continue
+        anchor = _anchor_node(tree, review.get("line")) if review.get("line") else None
+        if anchor is None:
+            skipped.append({"type": kind, "reason": "no statement at the issue location"})
+            continue
+
+        start, end, col = anchor
+        # Only the replacement is formatted; the rest of the file is left as written
+        code = format_code(code, line_length=max(40, LINE_LENGTH - col)).strip("\n")
+        new_text = textwrap.indent(code, " " * col) + "\n"
+        patched = "".join(lines[:start - 1]) + new_text + "".join(lines[end:])
+        try:
+            ast.parse(patched)
+        except SyntaxError as e:
+            skipped.append({"type": kind, "reason": f"patch does not parse: {e.msg}"})
+            continue
+        candidates.append((start, end, new_text, kind))
+
+    # Keep the first patch for any overlapping range
+    patches, last_end = [], 0
+    for patch in sorted(candidates, key=lambda p: (p[0], p[1])):
+        if patch[0] <= last_end:
+            skipped.append({"type": patch[3], "reason": f"overlaps another fix at line {patch[0]}"})
+            continue
+        patches.append(patch)
+        last_end = patch[1]
+    return patches, skipped
+
+
+def apply_patches(source, patches):
+    lines = source.splitlines(keepends=True)
+    for start, end, new_text, _ in sorted(patches, reverse=True):
+        lines[start - 1:end] = [new_text]
+    return "".join(lines)
+
+
+def format_code(source, line_length=LINE_LENGTH):
+    """Format with Black's in-process API; returns source unchanged if unavailable."""
+    try:
+        import black
+    except ImportError:
+        return source
+    try:
+        return black.format_str(source, mode=black.Mode(line_length=line_length))
+    except Exception:
+        return source
+
+
+def write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".codeguard-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def apply_file(path, review_fn, dry_run=False):
+    """Review one file and apply its fixes; review_fn(path, source) returns reviews."""
+    result = {"file": path, "applied": [], "skipped": [], "diff": ""}
+    if not path.endswith(".py"):
+        result["skipped"].append({"type": "all", "reason": "only Python files are supported for auto-fix"})
+        return result
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    try:
+        ast.parse(source)
+    except SyntaxError as e:
+        result["skipped"].append({"type": "all", "reason": f"file does not parse: {e.msg}"})
+        return result
+
+    patches, skipped = build_patches(source, review_fn(path, source))
+    result["skipped"] = skipped
+    if not patches:
+        return result
+    new_source = apply_patches(source, patches)
+    # Final guard: never write something that no longer parses
+    try:
+        ast.parse(new_source)
+    except SyntaxError as e:
+        result["skipped"].append({"type": "all", "reason": f"combined fix does not parse: {e.msg}"})
+        return result
+
+    result["applied"] = [p[3] for p in patches]
+    if new_source != source:
+        result["diff"] = "".join(difflib.unified_diff(
+            source.splitlines(keepends=True), new_source.splitlines(keepends=True),
+            fromfile=f"a/{path}", tofile=f"b/{path}"
+        ))
+        if not dry_run:
+            write_atomic(path, new_source)
+    return result
+
+
+def apply_paths(paths, review_fn, dry_run=False, workers=8):
+    """Apply fixes to many files in parallel; yields results in input order."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(lambda p: apply_file(p, review_fn, dry_run), paths)
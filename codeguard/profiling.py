@@ -0,0 +1,124 @@
+# ==========================================
+# Hot-path profiling (stages, rules, files, LLM)
+# ==========================================
+import contextlib
+import json
+import threading
+import time
+
+_NULL = contextlib.nullcontext()
+
+
+class Profiler:
+    """Accumulates wall time per stage, rule and file, plus LLM usage.
+
+    Disabled by default: stage() then returns a shared null context and
+    timed_rules() hands back the original rule list, so instrumented code
+    pays one attribute check per call site.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.rules = {}
+        self.files = {}
+        self.llm = {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _add(self, table, key, elapsed):
+        with self._lock:
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += elapsed
+
+    @contextlib.contextmanager
+    def _timer(self, table, key):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(table, key, time.perf_counter() - start)
+
+    def stage(self, name):
+        return self._timer(self.stages, name) if self.enabled else _NULL
+
+    def file(self, path):
+        return self._timer(self.files, path) if self.enabled else _NULL
+
+    def timed_rules(self, rules):
+        """Wrap rule callables so each call is timed under its function name."""
+        if not self.enabled:
+            return rules
+
+        def wrap(rule):
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return rule(*args, **kwargs)
+                finally:
+                    self._add(self.rules, rule.__name__.lstrip("_"), time.perf_counter() - start)
+            return timed
+
+        return [wrap(rule) for rule in rules]
+
+    def record_llm(self, seconds, prompt_tokens=0, completion_tokens=0):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.llm["calls"] += 1
+            self.llm["seconds"] += seconds
+            self.llm["prompt_tokens"] += prompt_tokens or 0
+            self.llm["completion_tokens"] += completion_tokens or 0
+
+    # ------------------------------------------
+    # REPORTING
+    # ------------------------------------------
+    def to_dict(self, top_files=20):
+        def rows(table):
+            return {
+                key: {"calls": calls, "seconds": round(total, 6), "avg_ms": round(total / calls * 1000, 3)}
+                for key, (calls, total) in sorted(table.items(), key=lambda kv: -kv[1][1])
+            }
+
+        files = sorted(self.files.items(), key=lambda kv: -kv[1][1])[:top_files]
+        return {
+            "stages": rows(self.stages),
+            "rules": rows(self.rules),
+            "slowest_files": {path: round(total, 6) for path, (_, total) in files},
+            "files_profiled": len(self.files),
+            "llm": dict(self.llm, seconds=round(self.llm["seconds"], 6)),
+        }
+
+    def format_table(self, top_files=10):
+        data = self.to_dict(top_files)
+        out = []
+        for title, table in (("Stage", data["stages"]), ("Rule", data["rules"])):
+            if not table:
+                continue
+            out.append(f"{title:<32} {'calls':>8} {'total ms':>12} {'avg ms':>10}")
+            for key, row in table.items():
+                out.append(f"{key:<32} {row['calls']:>8} {row['seconds'] * 1000:>12.2f} {row['avg_ms']:>10.3f}")
+            out.append("")
+        if data["slowest_files"]:
+            out.append(f"{'Slowest files':<60} {'ms':>10}")
+            for path, seconds in data["slowest_files"].items():
+                out.append(f"{path[-60:]:<60} {seconds * 1000:>10.2f}")
+            out.append("")
+        llm = data["llm"]
+        if llm["calls"]:
+            out.append(f"LLM: {llm['calls']} calls, {llm['seconds']:.2f}s, "
+                       f"{llm['prompt_tokens']} prompt / {llm['completion_tokens']} completion tokens")
+        return "\n".join(out)
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(top_files=100), f, indent=2)
+
+
+PROFILER = Profiler()
+stage = PROFILER.stage
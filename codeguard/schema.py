@@ -0,0 +1,184 @@
+# ==========================================
+# Result schema: Issue, FileResult and their wire format
+# ==========================================
+import marshal
+import sys
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+try:
+    import msgpack
+except ImportError:  # optional: `pip install codeguard[fast]`
+    msgpack = None
+
+
+class Severity(IntEnum):
+    INFO = 1
+    WARNING = 2
+    ERROR = 3
+    CRITICAL = 4
+
+    @classmethod
+    def parse(cls, value):
+        """Severity from an enum, a name in any case or an int; unknown values are INFO."""
+        if isinstance(value, cls):
+            return value
+        try:
+            return cls[value.upper()] if isinstance(value, str) else cls(value)
+        except (KeyError, ValueError):
+            return cls.INFO
+
+
+@dataclass(slots=True)
+class Issue:
+    """One finding. Categories are interned, so millions of issues share a few strings.
+
+    Issues stay objects through analysis, metrics and review; to_dict() gives
+    the {"issue", "severity", "line", "category"} JSON shape at the output
+    boundary.
+    """
+
+    issue: str
+    severity: Severity = Severity.INFO
+    line: int | None = None
+    category: str = "general"
+    code: str | None = None
+
+    def __post_init__(self):
+        if type(self.severity) is not Severity:
+            self.severity = Severity.parse(self.severity)
+        self.category = sys.intern(self.category)
+
+    def to_dict(self):
+        data = {"issue": self.issue, "severity": self.severity.name, "line": self.line, "category": self.category}
+        if self.code is not None:
+            data["code"] = self.code
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("issue") or data.get("category") or "Unknown",
+            data.get("severity", Severity.INFO),
+            data.get("line"),
+            data.get("category") or "general",
+            data.get("code"),
+        )
+
+    @classmethod
+    def coerce(cls, value):
+        """Issue from an Issue, a legacy issue dict or a bare message string."""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        return cls(str(value), Severity.INFO, None, "general")
+
+
+@dataclass(slots=True)
+class FileResult:
+    """Analysis result for one file, shared by every analyzer and consumer.
+
+    status is "ok" or "skipped"; skipped results (see codeguard.engine) carry
+    the budget that was hit in reason/detail and have no issues. fragments
+    are the function fingerprints used by codeguard.duplication and symbols
+    the definitions/imports/references used by codeguard.symbols; both travel
+    with the result between processes but are not part of the JSON shape.
+    """
+
+    file: str
+    language: str
+    issues: list = field(default_factory=list)
+    complexity: int = 0
+    lines: int = 0
+    status: str = "ok"
+    reason: str | None = None
+    detail: str | None = None
+    fragments: list = field(default_factory=list)
+    duplicated_lines: int = 0
+    symbols: tuple | None = None
+
+    def to_dict(self):
+        data = {
+            "file": self.file,
+            "language": self.language,
+            "status": self.status,
+            "complexity": self.complexity,
+            "lines": self.lines,
+            "duplicated_lines": self.duplicated_lines,
+            "issues": [issue.to_dict() for issue in self.issues],
+        }
+        if self.status != "ok":
+            data["reason"] = self.reason
+            data["detail"] = self.detail
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("file", "unknown"),
+            data.get("language", "unknown"),
+            [Issue.coerce(issue) for issue in data.get("issues", [])],
+            data.get("complexity", 0),
+            data.get("lines", 0),
+            data.get("status", "ok"),
+            data.get("reason"),
+            data.get("detail"),
+            duplicated_lines=data.get("duplicated_lines", 0),
+        )
+
+    @classmethod
+    def coerce(cls, value):
+        """FileResult from a FileResult or a legacy {"file", "issues", ...} dict."""
+        return value if isinstance(value, cls) else cls.from_dict(value)
+
+    # Flat tuples of builtins: what the binary codecs below actually carry
+    def to_tuple(self):
+        return (self.file, self.language, self.complexity, self.lines, self.status, self.reason, self.detail,
+                [(i.issue, int(i.severity), i.line, i.category, i.code) for i in self.issues],
+                self.fragments, self.duplicated_lines, self.symbols)
+
+    @classmethod
+    def from_tuple(cls, row):
+        file, language, complexity, lines, status, reason, detail, issues, fragments, duplicated, symbols = row
+        return cls(file, language, [Issue(*issue) for issue in issues], complexity, lines, status, reason, detail,
+                   [tuple(fragment) for fragment in fragments], duplicated, symbols)
+
+
+# ------------------------------------------
+# BINARY WIRE FORMAT (workers, caches, shards)
+# ------------------------------------------
+# One tag byte says which codec wrote the payload, so a reader without
+# msgpack can still fall back cleanly on its own marshal output.
+_MSGPACK, _MARSHAL = b"M", b"R"
+
+
+def encode_results(results):
+    rows = [result.to_tuple() for result in results]
+    if msgpack is not None:
+        return _MSGPACK + msgpack.packb(rows, use_bin_type=True)
+    return _MARSHAL + marshal.dumps(rows)
+
+
+def decode_results(data):
+    tag, payload = data[:1], data[1:]
+    if tag == _MSGPACK:
+        if msgpack is None:
+            raise ValueError("payload was written with msgpack, which is not installed")
+        rows = msgpack.unpackb(payload, raw=False)
+    elif tag == _MARSHAL:
+        rows = marshal.loads(payload)
+    else:
+        raise ValueError("not a CodeGuard result payload")
+    return [FileResult.from_tuple(row) for row in rows]
+
+
+def json_default(obj):
+    """json.dumps(default=...) hook that renders results and issues in their dict shape."""
+    if isinstance(obj, (Issue, FileResult)):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def issues_as_dicts(issues):
+    return [issue.to_dict() for issue in issues]
@@ -0,0 +1,87 @@
+# ==========================================
+# Sharded scans: partition files across CI nodes, merge partial results
+# ==========================================
+import hashlib
+import heapq
+import json
+import os
+import struct
+
+from codeguard.schema import decode_results, encode_results
+
+MAGIC = b"CGSHARD1"
+
+
+def parse_shard(value):
+    """Parse "i/N" (1-based) into (i, N)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"expected i/N, got {value!r}") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"shard {value!r} is out of range")
+    return index, count
+
+
+def shard_paths(paths, index, count, root="."):
+    """The paths shard index (1-based) of count is responsible for.
+
+    Every node computes the same assignment from the same checkout: files
+    are ordered by size (largest first, ties broken by a hash of the path
+    relative to root) and each goes to the currently lightest shard, so
+    shards get about the same number of bytes rather than of files.
+    """
+    def key(path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        rel = os.path.relpath(path, root).replace(os.sep, "/")
+        return -size, hashlib.blake2b(rel.encode("utf-8"), digest_size=8).digest(), size, path
+
+    loads = [(0, shard) for shard in range(1, count + 1)]
+    mine = []
+    for _, _, size, path in sorted(map(key, paths)):
+        load, shard = heapq.heappop(loads)
+        if shard == index:
+            mine.append(path)
+        heapq.heappush(loads, (load + size, shard))
+    return sorted(mine)
+
+
+def write_partial(path, results, index, count):
+    """Write one shard's results: magic, a JSON header, then the binary result payload."""
+    header = json.dumps({"shard": index, "shards": count, "files": len(results)}).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack(">I", len(header)) + header)
+        f.write(encode_results(results))
+
+
+def read_partial(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a CodeGuard shard file")
+    offset = len(MAGIC) + 4
+    (length,) = struct.unpack(">I", data[len(MAGIC):offset])
+    header = json.loads(data[offset:offset + length])
+    return header, decode_results(data[offset + length:])
+
+
+def merge_partials(paths):
+    """Results of all shards, sorted by file; fails unless every shard 1..N is present once."""
+    shards = {}
+    count = None
+    for path in paths:
+        header, results = read_partial(path)
+        if count is None:
+            count = header["shards"]
+        elif header["shards"] != count:
+            raise ValueError(f"{path} is shard {header['shard']}/{header['shards']}, expected N={count}")
+        if header["shard"] in shards:
+            raise ValueError(f"shard {header['shard']}/{count} given more than once")
+        shards[header["shard"]] = results
+    missing = sorted(set(range(1, (count or 0) + 1)) - set(shards))
+    if missing:
+        raise ValueError(f"missing shard(s) {', '.join(map(str, missing))} of {count}")
+    return sorted((r for results in shards.values() for r in results), key=lambda r: r.file)
@@ -0,0 +1,314 @@
+# ==========================================
+# Project symbol/import index (SQLite) and cross-file checks
+# ==========================================
+import ast
+import os
+import sqlite3
+
+from codeguard.schema import Issue, Severity
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    module TEXT NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    entrypoint INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS definitions (
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    line INTEGER,
+    decorated INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imports (path TEXT NOT NULL, target TEXT NOT NULL, name TEXT, line INTEGER);
+CREATE TABLE IF NOT EXISTS refs (path TEXT NOT NULL, name TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_definitions_path ON definitions (path);
+CREATE INDEX IF NOT EXISTS idx_imports_path ON imports (path);
+CREATE INDEX IF NOT EXISTS idx_imports_name ON imports (name);
+CREATE INDEX IF NOT EXISTS idx_refs_path ON refs (path);
+CREATE INDEX IF NOT EXISTS idx_refs_name ON refs (name);
+"""
+
+# Definitions that are used without being referenced by name
+_DEAD_CODE_QUERY = r"""
+SELECT d.path, d.name, d.kind, d.line FROM definitions d
+WHERE d.decorated = 0
+  AND d.name != 'main'
+  AND d.name NOT LIKE 'test%'
+  AND d.name NOT LIKE '\_\_%\_\_' ESCAPE '\'
+  AND NOT EXISTS (SELECT 1 FROM refs r WHERE r.name = d.name)
+  AND NOT EXISTS (SELECT 1 FROM imports i WHERE i.name = d.name)
+ORDER BY d.path, d.line
+"""
+
+
+def _is_main_guard(node):
+    test = node.test
+    return (isinstance(test, ast.Compare) and isinstance(test.left, ast.Name)
+            and test.left.id == "__name__")
+
+
+def python_symbols(tree, imports, names):
+    """Definitions, imports and referenced names of one module, as plain tuples.
+
+    imports and names come from module1's ComplexityVisitor, so only the
+    module's top-level statements are looked at again here. The result is
+    (definitions, imports, references, entrypoint): definitions are
+    (name, kind, line, decorated) for top-level functions and classes,
+    imports are (module, name, level, line) per imported alias, references
+    is every name loaded or attribute accessed, and entrypoint tells whether
+    the module has an `if __name__ == ...` guard.
+    """
+    definitions = []
+    entrypoint = False
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            definitions.append((node.name, "function", node.lineno, bool(node.decorator_list)))
+        elif isinstance(node, ast.ClassDef):
+            definitions.append((node.name, "class", node.lineno, bool(node.decorator_list)))
+        elif isinstance(node, ast.If) and _is_main_guard(node):
+            entrypoint = True
+
+    rows = []
+    for node in imports:
+        if isinstance(node, ast.Import):
+            rows.extend((alias.name, None, 0, node.lineno) for alias in node.names)
+        else:
+            rows.extend((node.module or "", alias.name, node.level, node.lineno) for alias in node.names)
+    return definitions, rows, sorted(names), entrypoint
+
+
+def module_name(rel_path):
+    parts = os.path.splitext(rel_path)[0].split(os.sep)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def _resolve(module, is_package, target, level):
+    """Absolute dotted name for a (possibly relative) import in module."""
+    if not level:
+        return target
+    package = module.split(".") if is_package else module.split(".")[:-1]
+    if level > 1:
+        package = package[:-(level - 1)]
+    return ".".join(package + ([target] if target else []))
+
+
+class ProjectIndex:
+    """On-disk index of every Python module's definitions, imports and references.
+
+    Rows are keyed by path relative to root and stamped with (mtime, size),
+    so a refresh only re-analyzes files that changed. Cross-file checks are
+    queries over the stored rows and never re-parse the tree.
+    """
+
+    def __init__(self, root, path=None):
+        self.root = root
+        self.path = path or os.path.join(root, ".codeguard", "index.db")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _rel(self, path):
+        return os.path.relpath(path, self.root)
+
+    # ------------------------------------------
+    # Updates
+    # ------------------------------------------
+    def stale(self, paths):
+        """Return the paths that changed since they were indexed.
+
+        Files that are in the index but no longer in paths are dropped; the
+        second return value lists their relative paths.
+        """
+        known = {row[0]: row[1:] for row in self.conn.execute("SELECT path, mtime_ns, size FROM files")}
+        changed = []
+        seen = set()
+        for path in paths:
+            rel = self._rel(path)
+            seen.add(rel)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if known.get(rel) != (st.st_mtime_ns, st.st_size):
+                changed.append(path)
+        removed = sorted(set(known) - seen)
+        with self.conn:
+            self._delete(removed)
+        return changed, removed
+
+    def _delete(self, rels):
+        for table in ("files", "definitions", "imports", "refs"):
+            self.conn.executemany(f"DELETE FROM {table} WHERE path = ?", ((rel,) for rel in rels))
+
+    def update(self, results):
+        """Replace the rows of each analyzed file in one transaction; returns the count.
+
+        Results without symbols (skipped files, syntax errors) are not
+        recorded: the file keeps its last good rows and an outdated stamp,
+        so the next refresh analyzes it again.
+        """
+        count = 0
+        with self.conn:
+            for result in results:
+                if result.symbols is None:
+                    continue
+                rel = self._rel(result.file)
+                try:
+                    st = os.stat(result.file)
+                except OSError:
+                    continue
+                self._delete([rel])
+                module = module_name(rel)
+                definitions, imports, references, entrypoint = result.symbols
+                self.conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                                  (rel, module, st.st_mtime_ns, st.st_size, int(entrypoint)))
+                self.conn.executemany("INSERT INTO definitions VALUES (?, ?, ?, ?, ?)",
+                                      ((rel, name, kind, line, int(decorated))
+                                       for name, kind, line, decorated in definitions))
+                is_package = os.path.basename(rel) == "__init__.py"
+                self.conn.executemany("INSERT INTO imports VALUES (?, ?, ?, ?)",
+                                      ((rel, _resolve(module, is_package, target, level), name, line)
+                                       for target, name, level, line in imports))
+                self.conn.executemany("INSERT INTO refs VALUES (?, ?)", ((rel, name) for name in references))
+                count += 1
+        return count
+
+    # ------------------------------------------
+    # Queries
+    # ------------------------------------------
+    def import_graph(self):
+        """{module: {imported project module: line}} plus {module: path}."""
+        modules = dict(self.conn.execute("SELECT module, path FROM files"))
+        by_path = {path: module for module, path in modules.items()}
+        graph = {module: {} for module in modules}
+        for path, target, name, line in self.conn.execute("SELECT path, target, name, line FROM imports"):
+            # `from pkg import mod` imports the submodule if there is one
+            candidates = [f"{target}.{name}"] if name and name != "*" else []
+            parts = target.split(".")
+            candidates += [".".join(parts[:i]) for i in range(len(parts), 0, -1)]
+            source = by_path[path]
+            for candidate in candidates:
+                if candidate in modules:
+                    if candidate != source:
+                        graph[source].setdefault(candidate, line)
+                    break
+        return graph, modules
+
+    def cycles(self, graph=None):
+        """Import cycles as sorted module lists (strongly connected components)."""
+        graph = graph if graph is not None else self.import_graph()[0]
+        # Iterative Tarjan: deep import chains must not hit the recursion limit
+        index, low, on_stack, stack, found = {}, {}, set(), [], []
+        counter = 0
+        for root in sorted(graph):
+            if root in index:
+                continue
+            work = [(root, iter(sorted(graph[root])))]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                child = next(children, None)
+                if child is not None:
+                    if child not in index:
+                        index[child] = low[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(graph[child]))))
+                    elif child in on_stack:
+                        low[node] = min(low[node], index[child])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        found.append(sorted(component))
+        return sorted(found)
+
+    def dead_code(self):
+        """Top-level functions and classes that no module references by name."""
+        return [{"file": path, "name": name, "kind": kind, "line": line}
+                for path, name, kind, line in self.conn.execute(_DEAD_CODE_QUERY)]
+
+    def unused_modules(self, graph=None):
+        """Package modules that nothing imports and that are not entry points.
+
+        Modules outside a package (no indexed __init__.py) are treated as
+        scripts and never reported.
+        """
+        graph = graph if graph is not None else self.import_graph()[0]
+        imported = {target for targets in graph.values() for target in targets}
+        rows = self.conn.execute("SELECT module, path FROM files WHERE entrypoint = 0 ORDER BY path")
+        return [path for module, path in rows
+                if module.rpartition(".")[0] in graph and module not in imported
+                and os.path.basename(path) not in ("__init__.py", "__main__.py")]
+
+    def coupling(self, graph=None):
+        """Fan-in (importing modules) and fan-out (imported modules) per module."""
+        graph = graph if graph is not None else self.import_graph()[0]
+        fan_in = {module: 0 for module in graph}
+        for targets in graph.values():
+            for target in targets:
+                fan_in[target] += 1
+        return sorted(({"module": module, "fan_in": fan_in[module], "fan_out": len(graph[module])}
+                       for module in graph), key=lambda m: (-m["fan_in"], -m["fan_out"], m["module"]))
+
+    def issues(self, graph=None, modules=None):
+        """Cross-file findings as {relative path: [Issue]}."""
+        if graph is None:
+            graph, modules = self.import_graph()
+        found = {}
+        for cycle in self.cycles(graph):
+            members = set(cycle)
+            for module in cycle:
+                line = min(line for target, line in graph[module].items() if target in members)
+                found.setdefault(modules[module], []).append(Issue(
+                    f"Import cycle between {', '.join(cycle)}", Severity.WARNING, line, "imports"))
+        for entry in self.dead_code():
+            found.setdefault(entry["file"], []).append(Issue(
+                f"{entry['kind'].capitalize()} '{entry['name']}' is never referenced in the project",
+                Severity.INFO, entry["line"], "dead code"))
+        for path in self.unused_modules(graph):
+            found.setdefault(path, []).append(Issue(
+                "Module is never imported in the project", Severity.INFO, None, "dead code"))
+        return found
+
+    def report(self):
+        graph, modules = self.import_graph()
+        return {
+            "modules": len(graph),
+            "cycles": self.cycles(graph),
+            "dead_code": self.dead_code(),
+            "unused_modules": self.unused_modules(graph),
+            "coupling": self.coupling(graph),
+            "issues": self.issues(graph, modules),
+        }
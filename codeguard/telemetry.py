@@ -0,0 +1,282 @@
+# ==========================================
+# OpenMetrics exporter (Prometheus text format)
+# ==========================================
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _fmt(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# TYPE {self.name} {self.kind}", f"# HELP {self.name} {self.documentation}"]
+
+    def drain(self):
+        """Return the values recorded so far and start again from zero."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def merge(self, values):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}_total{_labels(self.labelnames, key)} {_fmt(v)}" for key, v in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {_fmt(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total, count) in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def drain(self):
+        """Counter and histogram values since the last drain, by metric name.
+
+        Scan workers send this to the parent after every file so their
+        counts end up in the parent's registry (see merge); gauges describe
+        the current state of one process and are not carried over.
+        """
+        return {m.name: m.drain() for m in self.metrics if m.kind in ("counter", "histogram")}
+
+    def merge(self, deltas):
+        for metric in self.metrics:
+            if metric.name in deltas:
+                metric.merge(deltas[metric.name])
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ------------------------------------------
+# CODEGUARD METRICS
+# ------------------------------------------
+FILES_ANALYZED = REGISTRY.register(Counter(
+    "codeguard_files_analyzed", "Files analyzed.", ["language"]))
+BYTES_READ = REGISTRY.register(Counter(
+    "codeguard_bytes_read", "Source bytes read by the analyzers.", ["language"]))
+ANALYZER_SECONDS = REGISTRY.register(Histogram(
+    "codeguard_analyzer_duration_seconds", "Per-file analyzer latency.", ["analyzer"]))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "codeguard_cache_requests", "Result cache lookups.", ["cache", "result"]))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    "codeguard_cache_hit_ratio", "Result cache hit ratio since start.", ["cache"]))
+LLM_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "codeguard_llm_queue_depth", "LLM requests currently in flight or waiting."))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    "codeguard_llm_request_duration_seconds", "LLM request latency.", ["model"], buckets=LLM_BUCKETS))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "codeguard_llm_tokens", "Tokens reported by the LLM.", ["model", "kind"]))
+FILES_SKIPPED = REGISTRY.register(Counter(
+    "codeguard_files_skipped", "Files skipped by a per-file budget.", ["reason"]))
+ERRORS = REGISTRY.register(Counter(
+    "codeguard_errors", "Errors by pipeline stage.", ["stage"]))
+
+# Project gauges, named after the module3 summary fields
+PROJECT_GAUGES = {
+    key: REGISTRY.register(Gauge(f"codeguard_project_{key}", f"module3 summary: {key}."))
+    for key in ("average_quality_score", "average_maintainability_index", "total_issues",
+                "files_analyzed", "files_skipped", "compliance_rate", "duplication_percentage")
+}
+ISSUES_BY_CATEGORY = REGISTRY.register(Gauge(
+    "codeguard_project_category_issues", "module3 summary: category_distribution.", ["category"]))
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+    misses = CACHE_REQUESTS.value(cache=cache, result="miss")
+    CACHE_HIT_RATIO.set(round(hits / (hits + misses), 4), cache=cache)
+
+
+def instrumented(language):
+    """Count files/bytes and time an analyze_<lang>_source(code, ...) function."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(code, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(code, *args, **kwargs)
+            except Exception:
+                ERRORS.inc(stage=f"analyzer.{language}")
+                raise
+            finally:
+                size = len(code) if isinstance(code, bytes) or code.isascii() else len(code.encode("utf-8"))
+                FILES_ANALYZED.inc(language=language)
+                BYTES_READ.inc(size, language=language)
+                ANALYZER_SECONDS.observe(time.perf_counter() - start, analyzer=language)
+        return wrapper
+    return decorate
+
+
+def record_summary(summary):
+    for key, gauge in PROJECT_GAUGES.items():
+        gauge.set(summary.get(key, 0))
+    for category, count in summary.get("category_distribution", {}).items():
+        ISSUES_BY_CATEGORY.set(count, category=category)
+
+
+# ------------------------------------------
+# EXPOSITION
+# ------------------------------------------
+def write_textfile(path, registry=REGISTRY):
+    """Atomically write metrics for node_exporter's textfile collector."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".codeguard-metrics-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve /metrics from a background thread (used by the Streamlit app)."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="codeguard-metrics").start()
+    return server
@@ -0,0 +1,243 @@
+# ==========================================
+# Watch Mode: debounced incremental re-analysis
+# ==========================================
+import json
+import os
+import threading
+
+from codeguard.duplication import DuplicateIndex
+from codeguard.engine import analyze_guarded
+from codeguard.module1 import iter_source_files, SUPPORTED_EXTENSIONS, EXCLUDED_DIRS
+from codeguard.module3 import compute_file_metrics, summarize_metrics
+from codeguard.schema import json_default
+
+SUMMARY_DELTA_KEYS = (
+    "average_quality_score",
+    "average_maintainability_index",
+    "total_issues",
+    "files_analyzed",
+    "files_skipped",
+    "compliance_rate",
+    "duplication_percentage",
+)
+
+
+def _issue_key(issue):
+    return (issue.issue, issue.severity, issue.line, issue.category)
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class WatchSession:
+    """Keeps per-file results and metrics in memory and re-analyzes changed files.
+
+    File system events are collected into a pending set; a timer restarted on
+    every event flushes the set once the burst of saves has settled.
+    """
+
+    def __init__(self, root, emit, debounce=0.3):
+        self.root = root
+        self.emit = emit
+        self.debounce = debounce
+        self.results = {}
+        self.file_metrics = {}
+        self.categories = {}
+        self.stamps = {}
+        self.summary = {}
+        self.duplicates = DuplicateIndex()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    # ------------------------------------------
+    # Analysis state
+    # ------------------------------------------
+    def _analyze(self, path):
+        """Re-analyze path; returns (result, other files whose duplicates changed)."""
+        result = analyze_guarded(path)
+        self.results[path] = result
+        self.stamps[path] = _file_stamp(path)
+        return result, self.duplicates.add(path, result.fragments)
+
+    def _score(self, path):
+        result = self.duplicates.apply(self.results[path])
+        metrics, categories = compute_file_metrics(result)
+        self.file_metrics[path] = metrics
+        self.categories[path] = categories
+
+    def _forget(self, path):
+        self.file_metrics.pop(path, None)
+        self.categories.pop(path, None)
+        self.stamps.pop(path, None)
+        return self.results.pop(path, None), self.duplicates.remove(path)
+
+    def _summarize(self):
+        category_counts = {}
+        for categories in self.categories.values():
+            for cat, count in categories.items():
+                category_counts[cat] = category_counts.get(cat, 0) + count
+        return summarize_metrics(list(self.file_metrics.values()), category_counts)
+
+    def initial_scan(self):
+        for path in iter_source_files(self.root):
+            self._analyze(os.path.normpath(path))
+        # Duplicates need the whole index, so scoring waits for the full scan
+        for path in self.results:
+            self._score(path)
+        self.summary = self._summarize()
+        self.emit({"event": "ready", "root": self.root, "summary": self.summary})
+
+    # ------------------------------------------
+    # Event handling
+    # ------------------------------------------
+    def schedule(self, path):
+        """Queue a path for re-analysis, restarting the debounce timer."""
+        path = os.path.normpath(path)
+        if not path.endswith(SUPPORTED_EXTENSIONS):
+            return
+        if os.path.isfile(self.root):
+            if os.path.abspath(path) != os.path.abspath(self.root):
+                return
+            path = os.path.normpath(self.root)
+        else:
+            # Only directories below the watched root count: the root itself may
+            # live under a hidden directory such as ~/.work
+            rel = os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+            if rel.startswith(os.pardir + os.sep) or any(
+                    part in EXCLUDED_DIRS or part.startswith(".") for part in rel.split(os.sep)[:-1]):
+                return
+        with self._lock:
+            self._pending.add(path)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            self._timer = None
+
+        changed = False
+        updated = {}
+        neighbours = set()
+        for path in sorted(pending):
+            stamp = _file_stamp(path)
+            if stamp is None:
+                old, touched = self._forget(path)
+                neighbours |= touched
+                if old is not None:
+                    changed = True
+                    self.emit({"event": "file_removed", "file": path,
+                               "removed": old.issues, "added": []})
+                continue
+            if stamp == self.stamps.get(path):
+                # Editor touched the file without changing it
+                continue
+
+            updated[path] = self.results[path].issues if path in self.results else []
+            _, touched = self._analyze(path)
+            neighbours |= touched
+            changed = True
+
+        # Files whose duplicate partners changed are re-scored (not re-analyzed)
+        # and reported too when their duplication findings moved
+        for path in sorted(neighbours - set(updated)):
+            if path in self.results:
+                updated[path] = list(self.results[path].issues)
+        for path, old_issues in sorted(updated.items()):
+            self._score(path)
+            old_keys = {_issue_key(i): i for i in old_issues}
+            new_keys = {_issue_key(i): i for i in self.results[path].issues}
+            added = [i for k, i in new_keys.items() if k not in old_keys]
+            removed = [i for k, i in old_keys.items() if k not in new_keys]
+            if path in pending or added or removed:
+                changed = True
+                self.emit({
+                    "event": "file_updated",
+                    "file": path,
+                    "added": added,
+                    "removed": removed,
+                    "metrics": self.file_metrics[path],
+                })
+
+        if changed:
+            summary = self._summarize()
+            delta = {
+                key: round(summary[key] - self.summary.get(key, 0), 2)
+                for key in SUMMARY_DELTA_KEYS
+                if summary[key] != self.summary.get(key, 0)
+            }
+            self.summary = summary
+            self.emit({"event": "summary", "delta": delta, "summary": summary})
+
+
+# ------------------------------------------
+# OUTPUT FORMATTERS
+# ------------------------------------------
+def ndjson_emitter(echo):
+    def emit(event):
+        echo(json.dumps(event, default=json_default))
+    return emit
+
+
+def text_emitter(echo):
+    def emit(event):
+        kind = event["event"]
+        if kind == "ready":
+            s = event["summary"]
+            echo(f"[WATCH] {s['files_analyzed']} files, {s['total_issues']} issues, "
+                 f"quality {s['average_quality_score']}. Watching {event['root']} ...")
+        elif kind in ("file_updated", "file_removed"):
+            echo(f"[WATCH] {event['file']}" + (" (removed)" if kind == "file_removed" else ""))
+            for sign, key in (("+", "added"), ("-", "removed")):
+                for issue in event[key]:
+                    echo(f"  {sign} [{issue.severity.name}] line {issue.line or '-'}: {issue.issue}")
+        elif kind == "summary" and event["delta"]:
+            parts = ", ".join(f"{k} {v:+}" for k, v in event["delta"].items())
+            echo(f"[WATCH] summary: {parts}")
+    return emit
+
+
+def run_watch(path, emit, debounce=0.3):
+    """Run a blocking watch loop over path until interrupted."""
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+
+    session = WatchSession(path, emit, debounce=debounce)
+    session.initial_scan()
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            session.schedule(event.src_path)
+            dest = getattr(event, "dest_path", None)
+            if dest:
+                session.schedule(dest)
+
+    watch_root = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+    observer = Observer()
+    observer.schedule(Handler(), watch_root, recursive=os.path.isdir(path))
+    observer.start()
+    try:
+        while observer.is_alive():
+            observer.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+    return session
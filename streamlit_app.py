@@ -1,17 +1,29 @@
 import streamlit as st
 import os
-import time
+import hashlib
 import json
 import plotly.express as px
 import plotly.graph_objects as go
+import tarfile
 import zipfile
 from io import BytesIO
 import difflib
-import subprocess
-
-from codeguard.module1 import analyze_file
-from codeguard.module2 import generate_ai_review, log_feedback
+import math
+import copy
+import multiprocessing
+import threading
+from collections import OrderedDict
+
+from codeguard.archives import is_archive, iter_archive
+from codeguard.duplication import detect_duplicates
+from codeguard.engine import DEFAULT_BUDGET, max_file_bytes, scan_sources
+from codeguard.module1 import ANALYZERS
+from codeguard.module2 import (ReviewBudget, classify_issue, generate_ai_review, is_provisional, load_feedback_policy,
+                               log_feedback)
 from codeguard.module3 import compute_metrics
+from codeguard.executor import ExecutionPool
+from codeguard.schema import Severity, json_default
+from codeguard.telemetry import start_http_server
 
 # ==================================================
 # PAGE CONFIG
@@ -108,21 +120,29 @@ LANG_EXT = {
     "Go": ".go", "Rust": ".rs", "PHP": ".php",
     "HTML": ".html", "CSS": ".css", "Shell": ".sh", "Ruby": ".rb"
 }
+# .tar.gz etc. are matched on their last suffix by the uploader
+ARCHIVE_TYPES = ["zip", "tar", "gz", "tgz", "bz2", "tbz2", "xz", "txz"]
 uploaded_files, manual_code, manual_language = [], "", None
 
 if input_mode == "📂 Upload Files":
     uploaded_files = st.sidebar.file_uploader(
-        "Upload source files",
-        type=list(ext.strip('.') for ext in LANG_EXT.values()),
+        "Upload source files or archives",
+        type=list(ext.strip('.') for ext in LANG_EXT.values()) + ARCHIVE_TYPES,
         accept_multiple_files=True
     )
 else:
     manual_language = st.sidebar.selectbox("Select language", list(LANG_EXT.keys()))
     manual_code = st.sidebar.text_area("Paste code here", height=260)
 
+review_budget = st.sidebar.text_input(
+    "LLM review budget", help="e.g. 60s, 100req, 50ktok (comma-separated); CRITICAL issues are reviewed first"
+)
 run_btn = st.sidebar.button("🚀 Run CodeGuard")
 reset_btn = st.sidebar.button("🔄 Reset")
 
+export_dir = st.sidebar.text_input("Open export directory", help="Output of `codeguard scan --export DIR`")
+load_export_btn = st.sidebar.button("📂 Load Export")
+
 if reset_btn:
     st.session_state.clear()
     st.experimental_rerun()
@@ -130,67 +150,132 @@ if reset_btn:
 # ==================================================
 # RUN ANALYSIS + EXECUTION
 # ==================================================
-def run_code(file_path, language):
-    try:
-        if language.lower() == "python":
-            result = subprocess.run(["python", file_path], capture_output=True, text=True, timeout=5)
-            return result.stdout, result.stderr
-        elif language.lower() == "javascript":
-            result = subprocess.run(["node", file_path], capture_output=True, text=True, timeout=5)
-            return result.stdout, result.stderr
-        elif language.lower() == "java":
-            compile_result = subprocess.run(["javac", file_path], capture_output=True, text=True, timeout=5)
-            if compile_result.returncode != 0:
-                return "", compile_result.stderr
-            class_name = os.path.splitext(os.path.basename(file_path))[0]
-            result = subprocess.run(["java", class_name], capture_output=True, text=True, timeout=5)
-            return result.stdout, result.stderr
-        elif language.lower() in ["c", "c++"]:
-            exe_file = os.path.splitext(file_path)[0]
-            compiler = "gcc" if language.lower() == "c" else "g++"
-            compile_result = subprocess.run([compiler, file_path, "-o", exe_file], capture_output=True, text=True, timeout=5)
-            if compile_result.returncode != 0:
-                return "", compile_result.stderr
-            result = subprocess.run([exe_file], capture_output=True, text=True, timeout=5)
-            return result.stdout, result.stderr
-        elif language.lower() == "html":
-            with open(file_path, "r", encoding="utf-8") as f:
-                html_content = f.read()
-            st.components.v1.html(html_content, height=400, scrolling=True)
-            return "Rendered HTML above.", ""
-        else:
-            return "", f"Execution for {language} not supported yet."
-    except Exception as e:
-        return "", str(e)
+@st.cache_resource
+def get_execution_pool():
+    return ExecutionPool()
+
+
+@st.cache_resource
+def start_metrics_server():
+    """One /metrics endpoint per Streamlit process, enabled by CODEGUARD_METRICS_PORT."""
+    port = os.environ.get("CODEGUARD_METRICS_PORT")
+    return start_http_server(int(port)) if port else None
+
+
+start_metrics_server()
+
+
+def source_text(name):
+    """Decoded contents of an in-memory upload for this session."""
+    return st.session_state.buffers[name].decode("utf-8", errors="replace")
+
+
+# The Metrics tab draws one card per file up to this many; charts use every row
+MAX_METRIC_CARDS = 100
+
+
+def metrics_frame(metrics):
+    """Per-file metrics as a DataFrame with one column per severity."""
+    import pandas as pd
+
+    rows = []
+    for f in metrics["files"]:
+        row = {key: value for key, value in f.items() if key != "severity_breakdown"}
+        row.update((sev.lower(), count) for sev, count in f["severity_breakdown"].items())
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# Issue grids render one page at a time; filtering and grouping happen on the
+# whole DataFrame before anything is drawn
+PAGE_SIZES = [25, 50, 100, 250]
+ISSUE_GROUPS = {"None": None, "File": "file", "Rule": "category", "Severity": "severity"}
+
+
+def issues_frame(static_results):
+    """One row per static finding; repeated labels are stored as categoricals."""
+    import pandas as pd
+
+    rows = [(f.file, f.language, issue.line, issue.severity.name, issue.category, issue.issue, issue.code or "")
+            for f in static_results for issue in f.issues]
+    df = pd.DataFrame(rows, columns=["file", "language", "line", "severity", "category", "issue", "code"])
+    return df.astype({"file": "category", "language": "category", "severity": "category", "category": "category"})
+
+
+def reviews_frame(ai_results, static_results):
+    """One row per AI review; `review` indexes back into ai_results for the details."""
+    import pandas as pd
+
+    languages = {f.file: f.language for f in static_results}
+    rows = [(f["file"], languages[f["file"]], r["severity"], r["type"], r["occurrences"], (i, j))
+            for i, f in enumerate(ai_results) for j, r in enumerate(f["reviews"])]
+    return pd.DataFrame(rows, columns=["file", "language", "severity", "type", "occurrences", "review"])
+
+
+def paginate(df, key):
+    """Page size/number widgets; returns only the rows of the selected page."""
+    c1, c2, c3 = st.columns([1, 1, 2])
+    size = c1.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_size")
+    pages = max(1, math.ceil(len(df) / size))
+    # Filters may have shrunk the result below the remembered page
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = c2.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    c3.caption(f"{len(df)} rows · page {page} of {pages}")
+    return df.iloc[(page - 1) * size:page * size]
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_diff(digest, suggestion, _original):
+    """Unified diff of a suggestion against one version (digest) of a file."""
+    return "\n".join(difflib.unified_diff(
+        _original.splitlines(),
+        suggestion.splitlines(),
+        fromfile="Original",
+        tofile="AI Fix",
+        lineterm=""
+    ))
+
+
+def render_html(name):
+    st.components.v1.html(source_text(name), height=400, scrolling=True)
+
+
+def render_output(file_path, out):
+    st.markdown(f"### 📄 `{os.path.basename(file_path)}`")
+    if out[0]:
+        st.success("Program Output:")
+        st.code(out[0], language="text")
+    if out[1]:
+        st.error("Errors:")
+        st.code(out[1], language="text")
 
 
 def detect_language(filename):
+    """Language name as the analyzers report it (e.g. "cpp"), so feedback and exports agree."""
     ext = os.path.splitext(filename)[1].lower()
-    if ext == ".py":
-        return "python"
-    elif ext == ".js":
-        return "javascript"
-    elif ext in [".c", ".cpp"]:
-        return "c"
-    elif ext == ".java":
-        return "java"
-    else:
-        return "unknown"
+    return ANALYZERS[ext][0] if ext in ANALYZERS else ext.lstrip(".") or "unknown"
+
+
+def log_review_feedback(file, review, decision):
+    """Record a decision under the review's issue type, category and language, as FeedbackPolicy reads them."""
+    log_feedback(file, review["type"], decision, category=classify_issue(review["type"]),
+                 language=detect_language(file))
 
 
-def auto_apply_fixes(file_path, issues, ai_results):
-    import json
+def auto_apply_fixes(file_name, source, issues):
+    """Ask the model for a corrected version of source; returns the new code or None."""
     applied_code = None
     from codeguard.module2 import ollama_generate
 
     prompt = f"""
-Analyze these issues in {os.path.basename(file_path)}.
+Analyze these issues in {os.path.basename(file_name)}.
 1. Explain the problems clearly for humans.
 2. Then output ONLY the corrected code (no explanation, no markdown fences).
 Issues:
-{json.dumps(issues, indent=2)}
+{json.dumps(issues, indent=2, default=json_default)}
 """
-    llm_response = ollama_generate("Security/Style/Docs", code_snippet=open(file_path).read(), model="phi3")
+    llm_response = ollama_generate("Security/Style/Docs", code_snippet=source, model="phi3")
 
     # Extract code only
     code_fix = None
@@ -201,118 +286,166 @@ Issues:
         code_fix = llm_response.strip()
 
     if code_fix and "def " in code_fix:  # crude check for Python code
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(code_fix)
-        os.system(f"black {file_path}")
+        try:
+            import black
+            code_fix = black.format_str(code_fix, mode=black.Mode())
+        except Exception:
+            pass  # Black missing or the fix doesn't parse: keep it unformatted
         applied_code = code_fix
 
     return applied_code
 
-def generate_ai_review_batched(static_results, use_llm=True):
-    from codeguard.module2 import ollama_generate
-    ai_results = []
-
-    for f in static_results:
-        issues = f["issues"]
-        if not issues:
-            ai_results.append({"file": f["file"], "reviews": []})
-            continue
-
-        # Stronger prompt to force explanation first
-        prompt = f"""
-Analyze the following issues in {os.path.basename(f['file'])}.
-For each issue:
-- First, write a clear explanation of what’s wrong (plain text, no code).
-- Then output ONLY the corrected code inside a code block.
-Issues:
-{json.dumps(issues, indent=2)}
-"""
-
-        llm_response = ollama_generate(
-            "Security/Style/Docs",
-            code_snippet=open(f["file"], "r", encoding="utf-8").read(),
-            model="phi3"
-        )
-
-        explanation, suggestion = llm_response.strip(), ""
-
-        if "```" in llm_response:
-            parts = llm_response.split("```")
-            explanation = parts[0].strip()
-            suggestion = parts[1].replace("python", "").strip()
-        else:
-            explanation = llm_response.strip()
-            suggestion = ""
-
-        # Fallback if explanation is empty
-        if not explanation:
-            explanation = "AI generated fixes but did not provide a detailed explanation."
-
-        # Map severity based on static issues
-        sev = "CRITICAL" if any(i.get("severity") == "CRITICAL" for i in issues) else "INFO"
-
-        reviews = [{
-            "severity": sev,
-            "type": "batched_fix",
-            "review": explanation,
-            "suggestion": suggestion,
-            "occurrences": len(issues)
-        }]
-
-        ai_results.append({"file": f["file"], "reviews": reviews})
-
-    return ai_results
+# ==================================================
+# CACHED PIPELINE STAGES (keyed by file content hash)
+# ==================================================
+# Static results shared by all sessions, oldest evicted first
+MAX_CACHED_ANALYSES = 1000
+
+
+@st.cache_resource
+def static_analysis_cache():
+    # Analysis workers are started from a fork server: forking the Streamlit
+    # process itself would copy locks held by its other threads
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("forkserver", force=True)
+        multiprocessing.set_forkserver_preload(["codeguard.engine"])
+    return threading.Lock(), OrderedDict()
+
+
+def static_analysis(buffers, digests):
+    """Results for every buffer; new contents go through the `codeguard scan` worker pool.
+
+    Workers enforce the size limit, the time budget (with a hard kill), the
+    memory limit and the recursion limit, so a pathological upload comes
+    back as a skipped result instead of hanging or crashing the app.
+    Callers get copies, since duplicate detection updates results in place.
+    """
+    lock, cache = static_analysis_cache()
+    with lock:
+        missing = [(p, data, len(data)) for p, data in buffers.items() if (p, digests[p]) not in cache]
+    if missing:
+        results = list(scan_sources(missing, workers=min(len(missing), os.cpu_count() or 1),
+                                    budget=DEFAULT_BUDGET))
+        with lock:
+            for result in results:
+                cache[(result.file, digests[result.file])] = result
+            while len(cache) > MAX_CACHED_ANALYSES:
+                cache.popitem(last=False)
+    with lock:
+        return [copy.deepcopy(cache[(p, digests[p])]) for p in buffers]
+
+
+@st.cache_resource
+def review_cache():
+    return threading.Lock(), OrderedDict()
+
+
+def ai_review(static_results, digests, budget=None):
+    """Reviews for every file, through the same scheduler as `codeguard review`.
+
+    The feedback policy built from the Accept/Reject log routes rejected
+    issue types to templates, the budget orders LLM calls by severity
+    across all files, and identical requests are sent once. Reviews are
+    cached per file version and policy; reviews cut short by the budget
+    or by an LLM error are not, so the next run asks the model again.
+    """
+    policy = load_feedback_policy()
+    blocked = policy.blocked() if policy is not None else None
+    keys = [(f.file, digests[f.file], blocked) for f in static_results]
+    lock, cache = review_cache()
+    with lock:
+        missing = [f for f, key in zip(static_results, keys) if key not in cache]
+    fresh = {}
+    if missing:
+        for entry in generate_ai_review(missing, use_llm=True, policy=policy, budget=budget):
+            fresh[entry["file"]] = entry
+        with lock:
+            for f, key in zip(static_results, keys):
+                entry = fresh.get(f.file)
+                if entry is not None and not any(is_provisional(r) for r in entry["reviews"]):
+                    cache[key] = entry
+            while len(cache) > MAX_CACHED_ANALYSES:
+                cache.popitem(last=False)
+    with lock:
+        return [copy.deepcopy(fresh.get(f.file) or cache[key]) for f, key in zip(static_results, keys)], len(missing)
 
 
 # ==================================================
 # MAIN RUN BLOCK
 # ==================================================
-if run_btn:
-    file_paths = []
-    upload_dir = "uploaded_files"
-    os.makedirs(upload_dir, exist_ok=True)
+budget = None
+if run_btn and review_budget.strip():
+    try:
+        budget = ReviewBudget.parse(review_budget)
+    except ValueError as exc:
+        st.sidebar.error(str(exc))
+        run_btn = False
 
+if run_btn:
+    # Uploads stay in per-session memory; disk is only touched to execute them.
+    # Archive members are read straight from the upload, never extracted.
+    buffers, archived, oversized = {}, set(), []
     for f in uploaded_files:
-        path = os.path.join(upload_dir, f.name)
-        with open(path, "wb") as out:
-            out.write(f.read())
-        file_paths.append(path)
-
+        if not is_archive(f.name):
+            buffers[f.name] = f.getvalue()
+            continue
+        try:
+            for path, data, _ in iter_archive(f, max_bytes=max_file_bytes(DEFAULT_BUDGET), name=f.name):
+                if data is None:
+                    oversized.append(path)
+                else:
+                    buffers[path] = data
+                    archived.add(path)
+        except (OSError, EOFError, tarfile.TarError, zipfile.BadZipFile) as exc:
+            st.sidebar.error(f"Could not read {f.name}: {exc}")
+    if oversized:
+        st.sidebar.warning(f"Skipped {len(oversized)} archive members over {DEFAULT_BUDGET['max_file_mb']:g} MB")
     if manual_code.strip():
-        ext = LANG_EXT[manual_language]
-        manual_path = os.path.join(upload_dir, f"manual_input{ext}")
-        with open(manual_path, "w", encoding="utf-8") as f:
-            f.write(manual_code)
-        file_paths.append(manual_path)
+        buffers[f"manual_input{LANG_EXT[manual_language]}"] = manual_code.encode("utf-8")
+    st.session_state.buffers = buffers
+    file_paths = list(buffers)
+    digests = {name: hashlib.sha256(data).hexdigest() for name, data in buffers.items()}
 
     if not file_paths:
         st.warning("⚠️ Please provide code input.")
     else:
-        with st.spinner("⚡ CodeGuard is analyzing your code..."):
-            time.sleep(2)
-
-        static_results = [
-            {
-                "file": p,
-                "issues": analyze_file(p),
-                "language": detect_language(p),
-                "lines": sum(1 for _ in open(p, "r", encoding="utf-8"))
-            }
-            for p in file_paths
-        ]
+        known = st.session_state.setdefault("analyzed_digests", set())
+        changed = [p for p in file_paths if digests[p] not in known]
+
+        with st.status("⚡ CodeGuard is analyzing your code...", expanded=True) as status:
+            static_results = static_analysis(buffers, digests)
+            detect_duplicates(static_results)
+            status.write(f"🐞 Static analysis: {len(file_paths)} files ({len(changed)} new or changed)")
+            for f in static_results:
+                if f.status == "skipped":
+                    status.write(f"⚠️ Skipped {f.file}: {f.detail}")
+
+            ai_results, reviewed = ai_review(static_results, digests, budget)
+            status.write(f"🤖 AI review: {reviewed} files sent to the model")
 
-        ai_results = generate_ai_review_batched(static_results, use_llm=True)
-        metrics = compute_metrics(static_results)
-        outputs = {}
-        for f in static_results:
-            outputs[f["file"]] = run_code(f["file"], f["language"])
+            metrics = compute_metrics(static_results)
+            status.write("📊 Metrics computed")
+            status.update(label="⚡ Analysis finished", state="complete", expanded=False)
+        known.update(digests.values())
 
         st.session_state.static = static_results
         st.session_state.ai = ai_results
         st.session_state.metrics = metrics
-        st.session_state.outputs = outputs
+        st.session_state.issues_df = issues_frame(static_results)
+        st.session_state.reviews_df = reviews_frame(ai_results, static_results)
+        st.session_state.metrics_view = (metrics_frame(metrics), metrics["summary"])
+        # Unchanged programs reuse their last output; the rest run in the Program
+        # Output tab, which renders each result as it finishes
+        run_cache = st.session_state.setdefault("run_cache", {})
+        st.session_state.outputs = {
+            p: run_cache[(p, digests[p])] for p in file_paths if (p, digests[p]) in run_cache
+        }
+        # Archive members are analyzed but not executed
+        st.session_state.pending_runs = [
+            (p, digests[p]) for p in file_paths if p not in archived and (p, digests[p]) not in run_cache
+        ]
 
-        if all(len(f["issues"]) == 0 for f in static_results):
+        if all(not f.issues and f.status != "skipped" for f in static_results):
             st.success("🎉 Congratulations! No issues found.")
             st.balloons()
             st.snow()
@@ -320,6 +453,19 @@ if run_btn:
         else:
             st.success("✅ Analysis completed successfully!")
 
+if load_export_btn and export_dir:
+    from codeguard.columnar import read_export, to_pandas
+
+    try:
+        exported = compute_metrics(export_dir)
+        findings, _ = read_export(export_dir)
+    except (OSError, ValueError) as exc:
+        st.sidebar.error(f"Could not load export: {exc}")
+    else:
+        st.session_state.metrics_view = (to_pandas(exported["files"]), exported["summary"])
+        st.session_state.issues_df = to_pandas(findings)
+        st.sidebar.success(f"Loaded {exported['summary']['files_analyzed']} files from {export_dir}")
+
 # ==================================================
 # FILTERS
 # ==================================================
@@ -332,10 +478,13 @@ severity_filter = f1.multiselect(
     default=["CRITICAL", "ERROR", "WARNING", "INFO","AI"]
 )
 
+# Options are the analyzers' language names; the labels are the sidebar's
+LANG_LABELS = {detect_language(f"file{ext}"): label for label, ext in LANG_EXT.items()}
 language_filter = f2.multiselect(
     "Language",
-    [l.lower() for l in LANG_EXT.keys()],
-    default=[l.lower() for l in LANG_EXT.keys()]
+    list(LANG_LABELS),
+    default=list(LANG_LABELS),
+    format_func=LANG_LABELS.get
 )
 
 # ==================================================
@@ -351,105 +500,100 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs([
 
 # ---------------- STATIC ISSUES ----------------
 with tab1:
-    if "static" not in st.session_state:
+    if "issues_df" not in st.session_state:
         st.info("Run analysis to see issues.")
     else:
-        for f in st.session_state.static:
-            if f["language"].lower() not in language_filter:
-                continue
-            st.markdown(f"### 📄 `{os.path.basename(f['file'])}`")
-            st.markdown(f"<span class='lang-tag'>{f['language'].upper()}</span>", unsafe_allow_html=True)
-            shown = False
-            for issue in f["issues"]:
-                sev = issue.get("severity", "INFO") if isinstance(issue, dict) else "INFO"
-                iss = issue.get("issue", issue.get("category", "Unknown")) if isinstance(issue, dict) else str(issue)
-                line = issue.get("line", "N/A") if isinstance(issue, dict) else "N/A"
-                code = issue.get("code") if isinstance(issue, dict) else None
-                if sev not in severity_filter:
-                    continue
-                shown = True
-                with st.expander(f"{sev} - {iss}"):
-                    st.markdown(f"<span class='badge {sev}'> {sev} </span><br><b>{iss}</b>", unsafe_allow_html=True)
-                    st.write(f"Line: {line}")
-                    if code:
-                        st.code(code, language=f["language"])
-            if not shown:
-                st.info("No issues match current filters.")
+        issues_df = st.session_state.issues_df
+        issues_df = issues_df[issues_df["severity"].isin(severity_filter)
+                              & issues_df["language"].isin(language_filter)]
+        if issues_df.empty:
+            st.info("No issues match current filters.")
+        else:
+            group = ISSUE_GROUPS[st.radio("Group by", list(ISSUE_GROUPS), horizontal=True, key="issues_group")]
+            if group:
+                counts = issues_df.groupby(group, observed=True).size().sort_values(ascending=False)
+                st.dataframe(counts.rename("issues"), use_container_width=True)
+                selected = st.selectbox(f"Show {group}", counts.index.tolist(), key="issues_group_value")
+                issues_df = issues_df[issues_df[group] == selected]
+            st.dataframe(paginate(issues_df, "issues"), use_container_width=True, hide_index=True)
 
 # ---------------- AI REVIEW ----------------
 with tab2:
-    if "ai" not in st.session_state:
+    if "reviews_df" not in st.session_state:
         st.info("Run analysis to see AI review.")
     else:
-        for f in st.session_state.ai:
-            st.markdown(f"### 📄 `{os.path.basename(f['file'])}`")
-            for r in f["reviews"]:
-                if r["severity"] not in severity_filter:
-                    continue
-                with st.expander(f"{r['severity']} - {r['type']}"):
+        reviews_df = st.session_state.reviews_df
+        reviews_df = reviews_df[reviews_df["severity"].isin(severity_filter)
+                                & reviews_df["language"].isin(language_filter)]
+        if reviews_df.empty:
+            st.info("No reviews match current filters.")
+        else:
+            page = paginate(reviews_df, "reviews")
+            st.dataframe(page.drop(columns="review"), use_container_width=True, hide_index=True)
+            for (i, j), language in zip(page["review"], page["language"]):
+                f = st.session_state.ai[i]
+                r = f["reviews"][j]
+                key = f"{f['file']}_{r['type']}"
+                with st.expander(f"{os.path.basename(f['file'])}: {r['severity']} - {r['type']}"):
                     st.markdown(f"<span class='badge {r['severity']}'> {r['severity']} </span>", unsafe_allow_html=True)
                     st.write("🧠 What’s wrong?")
                     st.write(r["review"])
                     st.write("💡 How to fix")
                     st.write(r["suggestion"])
                     st.write(f"Occurrences: {r['occurrences']}")
-                    # Diff highlighting
-                    try:
-                        with open(f["file"], "r", encoding="utf-8") as orig_file:
-                            original_code = orig_file.read()
-                        diff = difflib.unified_diff(
-                            original_code.splitlines(),
-                            r["suggestion"].splitlines(),
-                            fromfile="Original",
-                            tofile="AI Fix",
-                            lineterm=""
-                        )
-                        st.code("\n".join(diff), language=f.get("language","python"))
-                    except Exception:
-                        st.warning("Diff view not available.")
+                    # Diff highlighting, computed only on request and once per file version
+                    if st.toggle("Show diff", key=f"{key}_diff"):
+                        data = st.session_state.buffers.get(f["file"])
+                        if data is None:
+                            st.warning("Diff view not available.")
+                        else:
+                            digest = hashlib.sha256(data).hexdigest()
+                            st.code(cached_diff(digest, r["suggestion"], source_text(f["file"])),
+                                    language=language)
                     # Feedback buttons
                     colf1, colf2 = st.columns(2)
-                    if colf1.button(f"✅ Accept {r['type']}", key=f"{f['file']}_{r['type']}_accept"):
-                        log_feedback(f["file"], r["type"], "accepted")
+                    if colf1.button(f"✅ Accept {r['type']}", key=f"{key}_accept"):
+                        log_review_feedback(f["file"], r, "accepted")
                         st.success("Feedback logged: accepted")
-                    if colf2.button(f"❌ Reject {r['type']}", key=f"{f['file']}_{r['type']}_reject"):
-                        log_feedback(f["file"], r["type"], "rejected")
+                    if colf2.button(f"❌ Reject {r['type']}", key=f"{key}_reject"):
+                        log_review_feedback(f["file"], r, "rejected")
                         st.warning("Feedback logged: rejected")
 
 # ---------------- METRICS ----------------
 with tab3:
-    if "metrics" not in st.session_state:
-        st.info("Run analysis to see metrics.")
+    if "metrics_view" not in st.session_state:
+        st.info("Run analysis or load an export to see metrics.")
     else:
-        metrics_data = st.session_state.metrics["files"]
-        for f in metrics_data:
-            st.markdown(f"### 📄 `{os.path.basename(f['file'])}`")
+        metrics_df, summary = st.session_state.metrics_view
+        labels = metrics_df["file"].astype(str).map(os.path.basename)
+        for _, f in metrics_df.head(MAX_METRIC_CARDS).iterrows():
+            st.markdown(f"### 📄 `{os.path.basename(str(f['file']))}`")
             cols = st.columns(4)
             cols[0].markdown(f"<div class='metric'>Quality<br>{f['quality_score']}</div>", unsafe_allow_html=True)
             cols[1].markdown(f"<div class='metric'>MI<br>{f['maintainability_index']}</div>", unsafe_allow_html=True)
             cols[2].markdown(f"<div class='metric'>Complexity<br>{f['cyclomatic_complexity']}</div>", unsafe_allow_html=True)
             cols[3].markdown(f"<div class='metric'>Issues<br>{f['issue_count']}</div>", unsafe_allow_html=True)
+        if len(metrics_df) > MAX_METRIC_CARDS:
+            st.caption(f"Showing {MAX_METRIC_CARDS} of {len(metrics_df)} files; the charts cover all of them.")
         # Charts
         fig = px.bar(
-            metrics_data,
-            x=[os.path.basename(f["file"]) for f in metrics_data],
-            y=[f["issue_count"] for f in metrics_data],
-            color=[f["quality_score"] for f in metrics_data],
-            labels={"x": "File", "y": "Issue Count", "color": "Quality Score"},
+            metrics_df,
+            x=labels,
+            y="issue_count",
+            color="quality_score",
+            labels={"x": "File", "issue_count": "Issue Count", "quality_score": "Quality Score"},
             title="📊 Issues per File vs Quality Score"
         )
         st.plotly_chart(fig, use_container_width=True)
-        severity_totals = {}
-        for f in metrics_data:
-            for sev, count in f["severity_breakdown"].items():
-                severity_totals[sev] = severity_totals.get(sev, 0) + count
+        severities = [sev.name.lower() for sev in sorted(Severity, reverse=True)]
+        severity_totals = metrics_df.reindex(columns=severities, fill_value=0).sum()
         fig_pie = px.pie(
-            names=list(severity_totals.keys()),
-            values=list(severity_totals.values()),
+            names=[sev.upper() for sev in severity_totals.index],
+            values=severity_totals.values,
             title="Severity Distribution Across Project"
         )
         st.plotly_chart(fig_pie, use_container_width=True)
-        compliance = st.session_state.metrics["summary"]["compliance_rate"]
+        compliance = summary["compliance_rate"]
         fig_gauge = go.Figure(go.Indicator(
             mode="gauge+number",
             value=compliance,
@@ -464,35 +608,51 @@ with tab4:
         st.info("Run analysis to see program output.")
     else:
         for file, out in st.session_state.outputs.items():
+            render_output(file, out)
+        pending = dict(st.session_state.pop("pending_runs", []))
+        for file in [p for p in pending if p.endswith(".html")]:
             st.markdown(f"### 📄 `{os.path.basename(file)}`")
-            if out[0]:
-                st.success("Program Output:")
-                st.code(out[0], language="text")
-            if out[1]:
-                st.error("Errors:")
-                st.code(out[1], language="text")
+            render_html(file)
+            st.session_state.outputs[file] = ("Rendered HTML above.", "")
+        programs = [p for p in pending if not p.endswith(".html")]
+        if programs:
+            progress = st.progress(0.0, text="🖥️ Running programs...")
+            sources = [(p, st.session_state.buffers[p]) for p in programs]
+            for done, result in enumerate(get_execution_pool().run_sources(sources), start=1):
+                out = (result["stdout"], result["stderr"])
+                st.session_state.outputs[result["file"]] = out
+                st.session_state.run_cache[(result["file"], pending[result["file"]])] = out
+                render_output(result["file"], out)
+                progress.progress(done / len(programs), text=f"🖥️ {done}/{len(programs)} programs finished")
+            progress.empty()
 
 # ---------------- APPLY FIXES ----------------
 with tab5:
     if "static" in st.session_state and "ai" in st.session_state:
         if st.button("⚡ Apply AI Fixes"):
             for f in st.session_state.static:
-                applied_code = auto_apply_fixes(f["file"], f["issues"], st.session_state.ai)
+                original_code = source_text(f.file)
+                applied_code = auto_apply_fixes(f.file, original_code, f.issues)
                 if applied_code:
-                    st.success(f"✅ Applied AI fix to {os.path.basename(f['file'])}")
+                    st.session_state.buffers[f.file] = applied_code.encode("utf-8")
+                    st.success(f"✅ Applied AI fix to {os.path.basename(f.file)}")
                     # Show diff before vs after
-                    with open(f["file"], "r", encoding="utf-8") as orig_file:
-                        new_code = orig_file.read()
                     diff = difflib.unified_diff(
+                        original_code.splitlines(),
                         applied_code.splitlines(),
-                        new_code.splitlines(),
                         fromfile="Before",
                         tofile="After",
                         lineterm=""
                     )
-                    st.code("\n".join(diff), language=f["language"])
+                    st.code("\n".join(diff), language=f.language)
+                    st.download_button(
+                        f"Download fixed {os.path.basename(f.file)}",
+                        data=applied_code,
+                        file_name=os.path.basename(f.file),
+                        key=f"download_fix_{f.file}"
+                    )
                 else:
-                    st.warning(f"No AI fix applied for {os.path.basename(f['file'])}")
+                    st.warning(f"No AI fix applied for {os.path.basename(f.file)}")
 
 
 # ==================================================
@@ -502,21 +662,21 @@ st.sidebar.header("📥 Export Reports")
 if "static" in st.session_state:
     st.sidebar.download_button(
         "Download Static Issues JSON",
-        data=json.dumps(st.session_state.static, indent=2),
+        data=json.dumps(st.session_state.static, indent=2, default=json_default),
         file_name="module1_report.json",
         mime="application/json"
     )
 if "ai" in st.session_state:
     st.sidebar.download_button(
         "Download AI Review JSON",
-        data=json.dumps(st.session_state.ai, indent=2),
+        data=json.dumps(st.session_state.ai, indent=2, default=json_default),
         file_name="ai_review.json",
         mime="application/json"
     )
 if "metrics" in st.session_state:
     st.sidebar.download_button(
         "Download Metrics JSON",
-        data=json.dumps(st.session_state.metrics, indent=2),
+        data=json.dumps(st.session_state.metrics, indent=2, default=json_default),
         file_name="module3_metrics.json",
         mime="application/json"
     )
@@ -524,9 +684,9 @@ if "metrics" in st.session_state:
     # Unified ZIP export
     buffer = BytesIO()
     with zipfile.ZipFile(buffer, "w") as z:
-        z.writestr("module1_report.json", json.dumps(st.session_state.static, indent=2))
-        z.writestr("ai_review.json", json.dumps(st.session_state.ai, indent=2))
-        z.writestr("module3_metrics.json", json.dumps(st.session_state.metrics, indent=2))
+        z.writestr("module1_report.json", json.dumps(st.session_state.static, indent=2, default=json_default))
+        z.writestr("ai_review.json", json.dumps(st.session_state.ai, indent=2, default=json_default))
+        z.writestr("module3_metrics.json", json.dumps(st.session_state.metrics, indent=2, default=json_default))
     st.sidebar.download_button(
         "📦 Download All Reports (ZIP)",
         data=buffer.getvalue(),